@@ -0,0 +1,216 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from .casc_wrapper import get_cache_dir
+
+
+def normalize_casc_path(casc_path):
+    return casc_path.replace('/', '\\').lower()
+
+
+class ExtractionCache:
+    ''' Persistent store of extracted CASC files keyed by (storage build, CASC path), evicted least recently used first '''
+
+    def __init__(self, root_dir, max_bytes):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # keys whose content hash was checked this session, and last_access times not yet written
+        self.verified = set()
+        self.pending_access = {}
+
+        # extract_many calls into the cache from worker threads, all access goes through self.lock
+        self.db = sqlite3.connect(os.path.join(root_dir, 'entries.sqlite'), check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            build_id TEXT NOT NULL,
+            casc_path TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            sha1 TEXT NOT NULL,
+            last_access REAL NOT NULL
+        )''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        self.db.commit()
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.flush_access()
+            self.db.commit()
+            self.db.close()
+
+    @staticmethod
+    def entry_key(build_id, casc_path):
+        return hashlib.sha1(f'{build_id}\0{normalize_casc_path(casc_path)}'.encode('utf-8')).hexdigest()
+
+    def entry_path(self, file_name):
+        return os.path.join(self.root_dir, file_name[:2], file_name)
+
+    def get(self, build_id, casc_path):
+        # local path of the cached file, or None on a miss
+        key = self.entry_key(build_id, casc_path)
+        with self.lock:
+            row = self.db.execute('SELECT file_name, size, sha1 FROM entries WHERE key = ?', (key,)).fetchone()
+            verified = key in self.verified
+        if row is None:
+            return self.miss()
+
+        # the content hash is checked on the first hit of each entry per session (outside the lock, it reads the whole
+        # file), later hits only check the size
+        file_path = self.entry_path(row[0])
+        valid = self.content_matches(file_path, row[1], None if verified else row[2])
+
+        with self.lock:
+            if valid:
+                self.verified.add(key)
+                # last_access is written with the next put, eviction or close, not committed on every hit
+                self.pending_access[key] = time.time()
+                self.hits += 1
+                return file_path
+
+            # the entry may have been replaced while its old content was hashed
+            if self.db.execute('SELECT sha1 FROM entries WHERE key = ?', (key,)).fetchone() == (row[2],):
+                self.remove_entry(key, row[0], row[1])
+                self.db.commit()
+        return self.miss()
+
+    def miss(self):
+        with self.lock:
+            self.misses += 1
+        return None
+
+    @staticmethod
+    def content_matches(file_path, size, sha1=None):
+        # size check, and content hash check unless sha1 is None
+        try:
+            if os.path.getsize(file_path) != size:
+                return False
+            if sha1 is None:
+                return True
+            with open(file_path, 'rb') as f:
+                return hashlib.file_digest(f, 'sha1').hexdigest() == sha1
+        except OSError:
+            return False
+
+    def put(self, build_id, casc_path, data):
+        # stores the file content and returns its local path
+        return self.put_chunks(build_id, casc_path, [data])
+
+    def put_chunks(self, build_id, casc_path, chunks):
+        # stores the content streamed as bytes-like chunks and returns its local path
+        key = self.entry_key(build_id, casc_path)
+        file_name = key + os.path.splitext(normalize_casc_path(casc_path).rsplit('\\', 1)[-1])[1]
+        file_path = self.entry_path(file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # write under a unique name first, so concurrent readers never see a partial file
+        temp_path = f'{file_path}.{threading.get_ident()}.tmp'
+        sha1 = hashlib.sha1()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    sha1.update(chunk)
+                    size += len(chunk)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self.lock:
+            row = self.db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.total_bytes -= row[0]
+            self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (key, build_id, casc_path, file_name, size, sha1.hexdigest(), time.time()))
+            self.total_bytes += size
+            self.verified.add(key)
+            self.pending_access.pop(key, None)
+            self.evict(keep_key=key)
+            self.db.commit()
+
+        return file_path
+
+    def verify(self, build_id, casc_path):
+        # checks the cached content against the recorded hash, dropping the entry if it was corrupted
+        key = self.entry_key(build_id, casc_path)
+        with self.lock:
+            row = self.db.execute('SELECT file_name, size, sha1 FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return False
+            if self.content_matches(self.entry_path(row[0]), row[1], row[2]):
+                self.verified.add(key)
+                return True
+            self.remove_entry(key, row[0], row[1])
+            self.db.commit()
+            return False
+
+    def remove_entry(self, key, file_name, size):
+        try:
+            os.remove(self.entry_path(file_name))
+        except OSError:
+            pass
+        self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+        self.total_bytes -= size
+        self.verified.discard(key)
+        self.pending_access.pop(key, None)
+
+    def flush_access(self):
+        # writes the last_access times of cache hits, the caller commits
+        if self.pending_access:
+            self.db.executemany('UPDATE entries SET last_access = ? WHERE key = ?', [(last_access, key) for key, last_access in self.pending_access.items()])
+            self.pending_access.clear()
+
+    def evict(self, keep_key=None):
+        self.flush_access()
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, file_name, size in self.db.execute('SELECT key, file_name, size FROM entries ORDER BY last_access').fetchall():
+            if key == keep_key:
+                continue
+            self.remove_entry(key, file_name, size)
+            if self.total_bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self.lock:
+            for key, file_name, size in self.db.execute('SELECT key, file_name, size FROM entries').fetchall():
+                self.remove_entry(key, file_name, size)
+            self.db.commit()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+_extraction_cache = None
+
+
+def get_extraction_cache(max_bytes):
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache(get_cache_dir('files'), max_bytes)
+    elif _extraction_cache.max_bytes != max_bytes:
+        with _extraction_cache.lock:
+            _extraction_cache.max_bytes = max_bytes
+            _extraction_cache.evict()
+            _extraction_cache.db.commit()
+    return _extraction_cache
+
+
+def peek_extraction_cache():
+    return _extraction_cache
+
+
+def unregister():
+    global _extraction_cache
+    if _extraction_cache is not None:
+        _extraction_cache.close()
+        _extraction_cache = None
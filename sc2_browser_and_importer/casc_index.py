@@ -0,0 +1,216 @@
+import hashlib
+import os
+import sqlite3
+import time
+from .casc_wrapper import get_cache_dir
+
+SCHEMA_VERSION = 1
+
+# SQLite GLOB treats brackets as character classes, CascLib masks only know * and ?
+_glob_escape = str.maketrans({'[': '[[]', ']': '[]]'})
+
+
+def casc_basename(casc_path):
+    return casc_path.replace('/', '\\').rsplit('\\', 1)[-1]
+
+
+def casc_extension(casc_path):
+    return os.path.splitext(casc_basename(casc_path))[1].lower()
+
+
+class CascListingIndex:
+    ''' Persistent SQLite listing of every file in a CASC storage, rebuilt when the storage build changes '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS files (
+            path TEXT NOT NULL,
+            lower_path TEXT NOT NULL,
+            basename TEXT NOT NULL,
+            extension TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            file_flags INTEGER NOT NULL,
+            locale_flags INTEGER NOT NULL,
+            content_flags INTEGER NOT NULL
+        )''')
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def meta_get(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def is_current(self, build_id):
+        return self.meta_get('build_id') == build_id and self.meta_get('schema_version') == str(SCHEMA_VERSION)
+
+    def ensure(self, casc):
+        # returns True if the index was (re)built for the storage's current build
+        if not casc.is_open:
+            return False
+        build_id = casc.get_build_id()
+        if self.is_current(build_id):
+            return False
+        return self.build(casc.iter_files('*'), build_id)
+
+    def build(self, file_infos, build_id):
+        # returns False and keeps the previous listing when file_infos yields nothing, e.g. when CascFindFirstFile failed
+        start = time.perf_counter()
+        rows = []
+        inserted = 0
+        with self.db:
+            # the DELETE opens the transaction first, so a rollback also restores the dropped indices
+            self.db.execute('DELETE FROM files')
+            self.db.execute('DROP INDEX IF EXISTS files_lower_path')
+            self.db.execute('DROP INDEX IF EXISTS files_basename')
+            self.db.execute('DROP INDEX IF EXISTS files_extension')
+            for path, file_size, file_flags, locale_flags, content_flags in file_infos:
+                basename = casc_basename(path)
+                rows.append((path, path.lower(), basename.lower(), casc_extension(basename), file_size, file_flags, locale_flags, content_flags))
+                inserted += 1
+                if len(rows) >= 10000:
+                    self.db.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                    rows.clear()
+            if not inserted:
+                self.db.rollback()
+                print("SC2 Asset Browser: Storage listing is empty, index not updated")
+                return False
+            self.db.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.db.execute('CREATE INDEX files_lower_path ON files (lower_path)')
+            self.db.execute('CREATE INDEX files_basename ON files (basename)')
+            self.db.execute('CREATE INDEX files_extension ON files (extension)')
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('build_id', build_id))
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('schema_version', str(SCHEMA_VERSION)))
+        print(f"SC2 Asset Browser: Indexed {self.file_count()} files in {time.perf_counter() - start:.2f}s")
+        return True
+
+    def file_count(self):
+        return self.db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def all_paths(self):
+        return [row[0] for row in self.db.execute('SELECT path FROM files ORDER BY lower_path')]
+
+    def iter_rows(self):
+        # yields (path, file size, file flags) for every indexed file
+        yield from self.db.execute('SELECT path, file_size, file_flags FROM files ORDER BY lower_path')
+
+    def search(self, pattern, limit=None):
+        # CascLib style mask (* and ?), matched case-insensitively like CascFindFirstFile
+        return self.query(wildcard=pattern, limit=limit)
+
+    def query(self, wildcard=None, substring=None, extension=None, limit=None):
+        clauses = []
+        params = []
+        if wildcard:
+            clauses.append('lower_path GLOB ?')
+            params.append(wildcard.lower().translate(_glob_escape))
+        if substring:
+            clauses.append('instr(lower_path, ?) > 0')
+            params.append(substring.lower())
+        if extension:
+            clauses.append('extension = ?')
+            params.append(('.' + extension.lstrip('.')).lower())
+
+        sql = 'SELECT path FROM files'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY lower_path'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        return [row[0] for row in self.db.execute(sql, params)]
+
+
+# CASC roots tried for texture references, in priority order, after an exact path match
+DEFAULT_TEXTURE_ROOTS = (
+    "mods\\liberty.sc2mod\\base.sc2assets",
+    "campaigns\\liberty.sc2campaign\\base.sc2assets",
+    "mods\\swarm.sc2mod\\base.sc2assets",
+    "mods\\void.sc2mod\\base.sc2assets",
+)
+
+
+class TexturePathResolver:
+    ''' Maps texture paths referenced by models to CASC paths through a case-insensitive basename index of the listing '''
+
+    def __init__(self, paths, roots=DEFAULT_TEXTURE_ROOTS):
+        self.roots = [root.replace('/', '\\').strip('\\').lower() for root in roots]
+        self.by_basename = {}
+        for path in paths:
+            self.by_basename.setdefault(casc_basename(path).lower(), []).append(path)
+        self.resolved = {}
+
+    def root_priority(self, root):
+        # exact matches first, then the configured roots in order, then any other root
+        if not root:
+            return 0
+        if root in self.roots:
+            return 1 + self.roots.index(root)
+        return 1 + len(self.roots)
+
+    def resolve(self, tex_path):
+        # real CASC path of a referenced texture, or None if the storage has no such file
+        reference = tex_path.replace('/', '\\').strip('\\').lower()
+        if reference in self.resolved:
+            return self.resolved[reference]
+
+        # references without the texture folder are also looked up under Assets\Textures
+        suffixes = [reference]
+        if 'assets\\textures' not in reference:
+            suffixes.append('assets\\textures\\' + reference)
+
+        best = None
+        for path in self.by_basename.get(casc_basename(reference), ()):
+            lower_path = path.lower()
+            for suffix in suffixes:
+                if lower_path == suffix:
+                    root = ''
+                elif lower_path.endswith('\\' + suffix):
+                    root = lower_path[:-len(suffix) - 1]
+                else:
+                    continue
+                rank = (self.root_priority(root), suffix != reference, lower_path)
+                if best is None or rank < best[0]:
+                    best = (rank, path)
+
+        self.resolved[reference] = best[1] if best else None
+        return self.resolved[reference]
+
+
+_listing_indexes = {}
+
+
+def get_listing_index(casc):
+    # one index database per install path, checked against the storage build on every call
+    listing = _listing_indexes.get(casc.storage_path)
+    if listing is None:
+        path_hash = hashlib.sha1(os.path.normcase(os.path.abspath(casc.storage_path)).encode('utf-8')).hexdigest()[:16]
+        db_name = f'listing_{path_hash}.sqlite'
+        listing = _listing_indexes[casc.storage_path] = CascListingIndex(os.path.join(get_cache_dir('index'), db_name))
+    listing.ensure(casc)
+    return listing
+
+
+_texture_resolvers = {}
+
+
+def get_texture_resolver(casc, roots=DEFAULT_TEXTURE_ROOTS):
+    # kept across imports, resolved references are remembered until the storage build or roots change
+    listing = get_listing_index(casc)
+    key = (casc.storage_path, listing.meta_get('build_id'), tuple(roots))
+    resolver = _texture_resolvers.get(key)
+    if resolver is None:
+        _texture_resolvers.clear()
+        resolver = _texture_resolvers[key] = TexturePathResolver(listing.all_paths(), roots)
+    return resolver
+
+
+def unregister():
+    _texture_resolvers.clear()
+    for listing in _listing_indexes.values():
+        listing.close()
+    _listing_indexes.clear()
@@ -0,0 +1,269 @@
+import heapq
+import os
+import pickle
+from array import array
+from collections import Counter, defaultdict
+from .casc_index import get_listing_index
+
+try:
+    import numpy as np
+except ImportError:  # pure Python set intersection below is used instead
+    np = None
+
+# postings of trigrams found in more than this share of names are skipped by fuzzy scoring
+FUZZY_COMMON_GRAM_RATIO = 0.2
+
+# results of one search added to the UI list, short queries can match most of the storage
+SEARCH_RESULT_LIMIT = 1000
+
+# bumped when the pickled TrigramIndex layout changes
+SEARCH_INDEX_VERSION = 1
+
+
+def trigrams(text):
+    return {text[ii:ii + 3] for ii in range(len(text) - 2)}
+
+
+def split_terms(query):
+    # path separators split terms as well, so 'terran\\marine' behaves like 'terran marine'
+    return [term for term in query.lower().replace('/', ' ').replace('\\', ' ').split() if term]
+
+
+def iter_ids(ids, chunk_size=1024):
+    # converts a numpy id array to Python ints lazily, so consumers stopping early skip the rest
+    for start in range(0, len(ids), chunk_size):
+        yield from ids[start:start + chunk_size].tolist()
+
+
+class TrigramIndex:
+    ''' Inverted trigram index over lowercase CASC paths, with basenames and directories indexed separately '''
+
+    def __init__(self, paths):
+        self.paths = sorted(paths, key=str.lower)
+        self.names = []
+        self.dirs = []
+        self.dir_ids = array('I')
+        self.dir_files = []
+
+        dir_to_id = {}
+        for path in self.paths:
+            lower_path = path.lower().replace('/', '\\')
+            sep = lower_path.rfind('\\')
+            dir_name = lower_path[:sep] if sep != -1 else ''
+            if (dir_id := dir_to_id.get(dir_name)) is None:
+                dir_id = dir_to_id[dir_name] = len(self.dirs)
+                self.dirs.append(dir_name)
+                self.dir_files.append(array('I'))
+            self.dir_files[dir_id].append(len(self.names))
+            self.dir_ids.append(dir_id)
+            self.names.append(lower_path[sep + 1:])
+
+        self.name_grams = self.build_postings(self.names)
+        self.dir_grams = self.build_postings(self.dirs)
+
+        # path ids ordered by basename length, then path, and the position of each id in that order
+        self.by_name_order = array('I', sorted(range(len(self.names)), key=lambda ii: (len(self.names[ii]), ii)))
+        self.name_order = array('I', bytes(4 * len(self.names)))
+        for pos, ii in enumerate(self.by_name_order):
+            self.name_order[ii] = pos
+
+    def __len__(self):
+        return len(self.paths)
+
+    @staticmethod
+    def build_postings(strings):
+        postings = defaultdict(list)
+        for ii, string in enumerate(strings):
+            for gram in trigrams(string):
+                postings[gram].append(ii)
+        return {gram: array('I', posting) for gram, posting in postings.items()}
+
+    @staticmethod
+    def intersect(postings):
+        # postings are sorted id arrays, intersect starting from the shortest
+        postings = sorted(postings, key=len)
+        if np is not None:
+            ids = np.frombuffer(postings[0], dtype=np.uint32)
+            for posting in postings[1:]:
+                if not len(ids):
+                    break
+                ids = np.intersect1d(ids, np.frombuffer(posting, dtype=np.uint32), assume_unique=True)
+            return ids
+
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            if not ids:
+                break
+            ids.intersection_update(posting)
+        return ids
+
+    def candidates(self, term, strings, grams):
+        # ids of strings holding every trigram of the term, a superset of the strings containing it
+        if len(term) < 3:
+            return [ii for ii, string in enumerate(strings) if term in string]
+
+        postings = []
+        for gram in trigrams(term):
+            if (posting := grams.get(gram)) is None:
+                return []
+            postings.append(posting)
+
+        return self.intersect(postings)
+
+    def tier_candidates(self, terms):
+        # candidate ids for each rank tier, each ordered by name_order:
+        # basename starts with the first term, all terms in basename, some terms in basename, directory only
+        if np is not None:
+            return self.tier_candidates_numpy(terms)
+
+        matched = None
+        name_all = None
+        name_any = set()
+        for term in terms:
+            name_ids = set(self.candidates(term, self.names, self.name_grams))
+            term_ids = set(name_ids)
+            for dir_id in self.candidates(term, self.dirs, self.dir_grams):
+                term_ids.update(self.dir_files[dir_id])
+            matched = term_ids if matched is None else matched & term_ids
+            if not matched:
+                return []
+            name_all = name_ids if name_all is None else name_all & name_ids
+            name_any |= name_ids
+
+        name_all &= matched
+        name_some = (name_any & matched) - name_all
+        tiers = (name_all, (), name_some, matched - name_all - name_some)
+        return [sorted(tier, key=self.name_order.__getitem__) for tier in tiers]
+
+    def tier_candidates_numpy(self, terms):
+        dir_ids = np.frombuffer(self.dir_ids, dtype=np.uint32)
+        matched = None
+        name_all = None
+        name_any = np.zeros(len(self.names), dtype=bool)
+        for term in terms:
+            name_mask = np.zeros(len(self.names), dtype=bool)
+            name_mask[self.candidates(term, self.names, self.name_grams)] = True
+            dir_mask = np.zeros(len(self.dirs), dtype=bool)
+            dir_mask[self.candidates(term, self.dirs, self.dir_grams)] = True
+            term_mask = name_mask | dir_mask[dir_ids]
+            matched = term_mask if matched is None else matched & term_mask
+            if not matched.any():
+                return []
+            name_all = name_mask if name_all is None else name_all & name_mask
+            name_any |= name_mask
+
+        name_all &= matched
+        name_some = name_any & matched & ~name_all
+        tiers = (name_all, np.zeros_like(matched), name_some, matched & ~name_any)
+        order = np.frombuffer(self.by_name_order, dtype=np.uint32)
+        return [iter_ids(order[tier[order]]) for tier in tiers]
+
+    def tier(self, ii, terms):
+        # exact rank tier of a path, or None when some term does not occur in it
+        name = self.names[ii]
+        dir_name = self.dirs[self.dir_ids[ii]]
+        name_hits = 0
+        for term in terms:
+            if term in name:
+                name_hits += 1
+            elif term not in dir_name:
+                return None
+        if name_hits == len(terms):
+            return 0 if name.startswith(terms[0]) else 1
+        return 2 if name_hits else 3
+
+    def search(self, query, limit=None):
+        # every term must appear in the path, basename matches rank before directory matches
+        terms = split_terms(query)
+        if not terms:
+            return []
+
+        # trigram candidates may hold false positives, which can only lower a path's tier, so the
+        # exact tier is checked lazily while the ordered tiers are consumed
+        ranked = []
+        demoted = [[], [], [], []]
+        for tier_index, tier in enumerate(self.tier_candidates(terms)):
+            demoted_ids = sorted(demoted[tier_index], key=self.name_order.__getitem__)
+            for ii in heapq.merge(tier, demoted_ids, key=self.name_order.__getitem__):
+                exact_tier = self.tier(ii, terms)
+                if exact_tier is None:
+                    continue
+                if exact_tier > tier_index:
+                    demoted[exact_tier].append(ii)
+                    continue
+                ranked.append(ii)
+                if limit and len(ranked) >= limit:
+                    return [self.paths[ii] for ii in ranked]
+
+        return [self.paths[ii] for ii in ranked]
+
+    def fuzzy(self, query, limit=50, min_ratio=0.5):
+        # ranks basenames by the share of query trigrams they contain, tolerating typos
+        grams = set()
+        for term in split_terms(query):
+            grams |= trigrams(term)
+        if not grams:
+            return []
+
+        common_limit = max(1, int(len(self.names) * FUZZY_COMMON_GRAM_RATIO))
+        postings = [posting for gram in grams if (posting := self.name_grams.get(gram)) and len(posting) <= common_limit]
+        if not postings:
+            return []
+
+        min_hits = max(1, int(len(grams) * min_ratio + 0.5))
+        if np is not None:
+            counts = np.bincount(np.concatenate([np.frombuffer(posting, dtype=np.uint32) for posting in postings]))
+            hits = {int(ii): int(counts[ii]) for ii in np.nonzero(counts >= min_hits)[0]}
+        else:
+            counts = Counter()
+            for posting in postings:
+                counts.update(posting)
+            hits = {ii: count for ii, count in counts.items() if count >= min_hits}
+
+        ranked = heapq.nsmallest(limit, hits, key=lambda ii: (-hits[ii], len(self.names[ii]), ii))
+        return [self.paths[ii] for ii in ranked]
+
+
+_search_indexes = {}
+
+
+def search_index_load(listing, build_id):
+    # unpickles the index stored next to the listing database for this build, or builds and stores it
+    cache_path = os.path.splitext(listing.db_path)[0] + '.trigrams.pickle'
+    cache_key = (SEARCH_INDEX_VERSION, build_id)
+
+    try:
+        with open(cache_path, 'rb') as f:
+            if pickle.load(f) == cache_key:
+                return pickle.load(f)
+    except Exception:  # missing, stale or unreadable cache, rebuilt below
+        pass
+
+    index = TrigramIndex(listing.all_paths())
+    if build_id is None:
+        return index
+
+    try:
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(cache_key, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:  # the index is just built again next session
+        pass
+
+    return index
+
+
+def get_search_index(casc):
+    # built once per storage build and kept on disk, reloaded whenever the listing reports a different build
+    listing = get_listing_index(casc)
+    build_id = listing.meta_get('build_id')
+    cached = _search_indexes.get(casc.storage_path)
+    if cached is None or cached[0] != build_id:
+        cached = _search_indexes[casc.storage_path] = (build_id, search_index_load(listing, build_id))
+    return cached[1]
+
+
+def unregister():
+    _search_indexes.clear()
@@ -0,0 +1,117 @@
+import shutil
+import threading
+import time
+import bpy
+from .casc_cache import get_extraction_cache
+from .casc_wrapper import CascWrapper, buffer_pool
+
+
+class CascSession:
+    ''' Process-wide CascWrapper shared by all operators, so storage index files are only loaded once '''
+
+    def __init__(self):
+        self.casc = None
+        self.last_used = 0.0
+        self.stats = {}
+        self.lock = threading.RLock()
+        # temp dir of local_file copies and imports, kept across idle closes and removed on unregister
+        self.temp_dir = None
+
+    def acquire(self, caller='default'):
+        # returns the shared wrapper, opening (or reopening for a new install path) when needed
+        with self.lock:
+            preferences = get_preferences()
+            install_path = preferences.sc2_install_path
+            if self.casc is not None and self.casc.storage_path != install_path:
+                print(f"SC2 Asset Browser: Install path changed, reopening storage at {install_path}")
+                self.close()
+
+            caller_stats = self.stats.setdefault(caller, {'hits': 0, 'misses': 0})
+            if self.casc is not None and self.casc.is_open:
+                caller_stats['hits'] += 1
+            else:
+                caller_stats['misses'] += 1
+                if self.casc is None:
+                    self.casc = CascWrapper()
+                    self.casc.temp_dir = self.temp_dir
+                self.casc.open_storage()
+
+            if preferences.use_extraction_cache:
+                self.casc.cache = get_extraction_cache(preferences.extraction_cache_size * 1024 * 1024)
+            else:
+                self.casc.cache = None
+
+            self.last_used = time.monotonic()
+            schedule_idle_check()
+            return self.casc
+
+    def release(self):
+        # restarts the idle countdown once the caller is done with the storage
+        with self.lock:
+            self.last_used = time.monotonic()
+            schedule_idle_check()
+
+    def close(self):
+        with self.lock:
+            if self.casc is not None:
+                self.casc.close_storage()
+                self.temp_dir = self.casc.temp_dir
+                self.casc = None
+            buffer_pool.clear()
+
+    def remove_temp_dir(self):
+        with self.lock:
+            if self.temp_dir is not None:
+                shutil.rmtree(self.temp_dir, ignore_errors=True)
+                self.temp_dir = None
+
+    def idle_time(self):
+        return time.monotonic() - self.last_used
+
+    def is_open(self):
+        return self.casc is not None and self.casc.is_open
+
+
+_session = CascSession()
+
+
+def get_session():
+    return _session
+
+
+def get_preferences():
+    return bpy.context.preferences.addons[__package__].preferences
+
+
+def _idle_check():
+    timeout = get_preferences().casc_idle_timeout
+    if not _session.is_open() or timeout <= 0:
+        return None
+
+    remaining = timeout - _session.idle_time()
+    if remaining > 0:
+        return remaining
+
+    print(f"SC2 Asset Browser: Closing storage after {timeout}s idle")
+    _session.close()
+    _session.remove_temp_dir()
+    return None
+
+
+def schedule_idle_check():
+    # called on every acquire and release and when the timeout preference changes, as _idle_check unregisters itself
+    # once the storage is closed or the timeout is 0
+    timeout = get_preferences().casc_idle_timeout
+    if timeout > 0 and _session.is_open() and not bpy.app.timers.is_registered(_idle_check):
+        bpy.app.timers.register(_idle_check, first_interval=timeout, persistent=True)
+
+
+def register():
+    pass
+
+
+def unregister():
+    if bpy.app.timers.is_registered(_idle_check):
+        bpy.app.timers.unregister(_idle_check)
+    _session.close()
+    _session.remove_temp_dir()
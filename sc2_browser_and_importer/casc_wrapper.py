@@ -1,6 +1,14 @@
 import ctypes
+import hashlib
+import io
 import os
+import shutil
 import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import bpy
 
 # Define types
@@ -12,6 +20,7 @@ PDWORD = ctypes.POINTER(DWORD)
 
 # Constants
 CASC_LOCALE_ALL = 0xFFFFFFFF
+CASC_CHUNK_SIZE = 1 << 20
 
 class CASC_FIND_DATA(ctypes.Structure):
     _fields_ = [
@@ -23,6 +32,141 @@ class CASC_FIND_DATA(ctypes.Structure):
         ("dwContentFlags", DWORD),
     ]
 
+# per-file outcome of the batch APIs, data is set by read_many and dest_path by extract_many
+CascFileResult = namedtuple('CascFileResult', ['casc_path', 'success', 'size', 'seconds', 'data', 'dest_path'], defaults=[None, None])
+
+
+def get_cache_dir(*subdirs):
+    # per-user directory for data derived from the SC2 storage (listing index, extraction cache)
+    try:
+        base_dir = bpy.utils.extension_path_user(__package__, path="cache", create=True)
+    except (AttributeError, ValueError):
+        base_dir = os.path.join(bpy.utils.user_resource('CONFIG', path=__package__, create=True), "cache")
+
+    cache_dir = os.path.join(base_dir, *subdirs)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+class CascFileStream(io.RawIOBase):
+    ''' Unbuffered file object over an open CASC file handle, reading straight into the caller's buffer '''
+
+    def __init__(self, casc, hFile, size, name=''):
+        super().__init__()
+        self.casc = casc
+        self.hFile = hFile
+        self.size = size
+        self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        if not len(view):
+            return 0
+        bytes_read = DWORD()
+        c_buffer = (ctypes.c_char * len(view)).from_buffer(view)
+        if not self.casc.CascReadFile(self.hFile, c_buffer, len(view), ctypes.byref(bytes_read)):
+            raise OSError(f"CascReadFile failed for {self.name} (Error: {self.casc.GetCascError()})")
+        return bytes_read.value
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # io.SEEK_* match CascLib's FILE_BEGIN, FILE_CURRENT and FILE_END
+        new_pos = ctypes.c_ulonglong()
+        if not self.casc.CascSetFilePointer64(self.hFile, offset, ctypes.byref(new_pos), whence):
+            raise OSError(f"CascSetFilePointer64 failed for {self.name} (Error: {self.casc.GetCascError()})")
+        return new_pos.value
+
+    def tell(self):
+        return self.seek(0, io.SEEK_CUR)
+
+    def close(self):
+        if not self.closed:
+            self.casc.CascCloseFile(self.hFile)
+        super().close()
+
+
+def iter_chunks(stream, chunk_size=CASC_CHUNK_SIZE):
+    # yields memoryviews of one reusable buffer, each is only valid until the next one is requested
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while (bytes_read := stream.readinto(view)):
+        yield view[:bytes_read]
+
+
+class BufferPool:
+    ''' Reusable ctypes buffers in power-of-two size classes, shared by pooled reads on all threads '''
+
+    def __init__(self, max_per_class=4, min_size=1 << 12, max_size=1 << 25, max_bytes=1 << 27):
+        # buffers above max_size are never pooled, and the pooled buffers together stay within max_bytes
+        self.max_per_class = max_per_class
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.free = {}
+        self.free_bytes = 0
+        self.lock = threading.Lock()
+
+    def size_class(self, size):
+        return max(self.min_size, 1 << (size - 1).bit_length())
+
+    def acquire(self, size):
+        capacity = self.size_class(size)
+        with self.lock:
+            buffers = self.free.get(capacity)
+            if buffers:
+                self.free_bytes -= capacity
+                return buffers.pop()
+        return ctypes.create_string_buffer(capacity)
+
+    def release(self, buffer):
+        # buffers that are too large or do not fit the budget are left to be freed
+        if len(buffer) > self.max_size:
+            return
+        with self.lock:
+            buffers = self.free.setdefault(len(buffer), [])
+            if len(buffers) < self.max_per_class and self.free_bytes + len(buffer) <= self.max_bytes:
+                buffers.append(buffer)
+                self.free_bytes += len(buffer)
+
+    def clear(self):
+        with self.lock:
+            self.free.clear()
+            self.free_bytes = 0
+
+
+buffer_pool = BufferPool()
+
+
+class PooledView:
+    ''' memoryview over a pooled buffer, the buffer returns to the pool on release() or when the with block ends '''
+
+    def __init__(self, pool, buffer, size):
+        self.pool = pool
+        self.buffer = buffer
+        self.view = memoryview(buffer).cast('B')[:size]
+
+    def __enter__(self):
+        return self.view
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def __len__(self):
+        return len(self.view)
+
+    def release(self):
+        if self.buffer is not None:
+            # raises BufferError if the caller still holds an export of the view, so the buffer cannot be reused under it
+            self.view.release()
+            self.pool.release(self.buffer)
+            self.buffer = None
+
+
 class CascWrapper:
     def __init__(self):
         preferences = bpy.context.preferences.addons[__package__].preferences
@@ -35,6 +179,11 @@ class CascWrapper:
         self.casc = None
         self.hStorage = None
         self.is_open = False
+        self.build_id = None
+        # ExtractionCache shared by sessions, set by the session manager when caching is enabled
+        self.cache = None
+        self.temp_dir = None
+        self.temp_dir_lock = threading.Lock()
         
         if not os.path.exists(self.lib_path):
             print(f"Embedded CascLib not found at: {self.lib_path}")
@@ -67,6 +216,9 @@ class CascWrapper:
             self.casc.CascGetFileSize.argtypes = [HANDLE, PDWORD]
             self.casc.CascGetFileSize.restype = DWORD
 
+            self.casc.CascSetFilePointer64.argtypes = [HANDLE, ctypes.c_longlong, ctypes.POINTER(ctypes.c_ulonglong), DWORD]
+            self.casc.CascSetFilePointer64.restype = ctypes.c_bool
+
             self.casc.GetCascError.argtypes = []
             self.casc.GetCascError.restype = DWORD
             
@@ -108,11 +260,22 @@ class CascWrapper:
             self.is_open = False
             self.hStorage = None
 
-    def search_files(self, pattern="*"):
+    def get_build_id(self):
+        # .build.info changes with every game patch, so its hash identifies the storage build
+        if self.build_id is None:
+            build_info_path = os.path.join(self.storage_path, ".build.info")
+            try:
+                with open(build_info_path, "rb") as f:
+                    self.build_id = hashlib.sha1(f.read()).hexdigest()
+            except OSError:
+                self.build_id = "unknown"
+        return self.build_id
+
+    def iter_files(self, pattern="*"):
+        # yields (file name, file size, file flags, locale flags, content flags) for each match
         if not self.is_open:
-            return []
+            return
 
-        results = []
         find_data = CASC_FIND_DATA()
         
         mask = pattern.encode('utf-8')
@@ -120,58 +283,165 @@ class CascWrapper:
         hFind = self.casc.CascFindFirstFile(self.hStorage, mask, ctypes.byref(find_data), None)
         
         if hFind and hFind != -1:
-            filename = find_data.szFileName.decode('utf-8', errors='ignore')
-            results.append(filename)
-            
-            while self.casc.CascFindNextFile(hFind, ctypes.byref(find_data)):
-                filename = find_data.szFileName.decode('utf-8', errors='ignore')
-                results.append(filename)
-                
-            self.casc.CascFindClose(hFind)
-            
-        return results
+            try:
+                while True:
+                    filename = find_data.szFileName.decode('utf-8', errors='ignore')
+                    yield filename, find_data.dwFileSize, find_data.dwFileFlags, find_data.dwLocaleFlags, find_data.dwContentFlags
+                    
+                    if not self.casc.CascFindNextFile(hFind, ctypes.byref(find_data)):
+                        break
+            finally:
+                self.casc.CascFindClose(hFind)
 
-    def extract_file(self, casc_path, dest_path):
+    def search_files(self, pattern="*"):
+        return [file_info[0] for file_info in self.iter_files(pattern)]
+
+    def open_file(self, casc_path, buffered=True):
+        # file object for streaming reads, None for missing or empty files
         if not self.is_open:
-            return False
+            return None
 
         hFile = HANDLE()
-        if self.casc.CascOpenFile(self.hStorage, casc_path.encode('utf-8'), CASC_LOCALE_ALL, 0, ctypes.byref(hFile)):
-            file_size = self.casc.CascGetFileSize(hFile, None)
-            
-            if file_size > 0:
-                buffer = ctypes.create_string_buffer(file_size)
-                bytes_read = DWORD()
-                if self.casc.CascReadFile(hFile, buffer, file_size, ctypes.byref(bytes_read)):
-                    
-                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                    
-                    with open(dest_path, "wb") as f:
-                        f.write(buffer.raw)
-                    
-                    self.casc.CascCloseFile(hFile)
-                    return True
-            
-            self.casc.CascCloseFile(hFile)
+        if not self.casc.CascOpenFile(self.hStorage, casc_path.encode('utf-8'), CASC_LOCALE_ALL, 0, ctypes.byref(hFile)):
+            return None
+
+        file_size = self.casc.CascGetFileSize(hFile, None)
+        stream = CascFileStream(self.casc, hFile, file_size, casc_path)
+        if file_size == 0:
+            stream.close()
+            return None
+
+        return io.BufferedReader(stream, buffer_size=CASC_CHUNK_SIZE) if buffered else stream
+
+    def cache_file(self, casc_path):
+        # streams the file into the extraction cache, returns the cache entry path
+        stream = self.open_file(casc_path, buffered=False)
+        if stream is None:
+            return None
+        with stream:
+            return self.cache.put_chunks(self.get_build_id(), casc_path, iter_chunks(stream))
+
+    def extract_file(self, casc_path, dest_path):
+        if self.cache is not None:
+            cached_path = self.cache.get(self.get_build_id(), casc_path) or self.cache_file(casc_path)
+            if cached_path is None:
+                return False
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.copyfile(cached_path, dest_path)
+            return True
+
+        stream = self.open_file(casc_path, buffered=False)
+        if stream is None:
+            return False
+
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        
+        with stream, open(dest_path, "wb") as f:
+            for chunk in iter_chunks(stream):
+                f.write(chunk)
         
-        return False
+        return True
 
     def read_file_content(self, casc_path):
-        if not self.is_open:
+        if self.cache is not None:
+            cached_path = self.cache.get(self.get_build_id(), casc_path) or self.cache_file(casc_path)
+            if cached_path is None:
+                return None
+            with open(cached_path, "rb") as f:
+                return f.read()
+
+        # always bytes, read_file_view is the copy free alternative
+        content = self.read_storage_file(casc_path)
+        return bytes(content) if content is not None else None
+
+    def read_file_view(self, casc_path):
+        # pooled, copy free read: returns a PooledView (use as a context manager) or None
+        if self.cache is not None:
+            cached_path = self.cache.get(self.get_build_id(), casc_path) or self.cache_file(casc_path)
+            if cached_path is None:
+                return None
+            stream = open(cached_path, "rb", buffering=0)
+            size = os.fstat(stream.fileno()).st_size
+        else:
+            stream = self.open_file(casc_path, buffered=False)
+            if stream is None:
+                return None
+            size = stream.size
+
+        with stream:
+            pooled = PooledView(buffer_pool, buffer_pool.acquire(size), size)
+            offset = 0
+            while offset < size and (bytes_read := stream.readinto(pooled.view[offset:])):
+                offset += bytes_read
+
+        if offset != size:
+            pooled.release()
             return None
+        return pooled
 
-        hFile = HANDLE()
-        content = None
-        
-        if self.casc.CascOpenFile(self.hStorage, casc_path.encode('utf-8'), CASC_LOCALE_ALL, 0, ctypes.byref(hFile)):
-            file_size = self.casc.CascGetFileSize(hFile, None)
-            
-            if file_size > 0:
-                buffer = ctypes.create_string_buffer(file_size)
-                bytes_read = DWORD()
-                if self.casc.CascReadFile(hFile, buffer, file_size, ctypes.byref(bytes_read)):
-                    content = buffer.raw
-            
-            self.casc.CascCloseFile(hFile)
-            
-        return content
+    def local_file(self, casc_path):
+        # path of a copy of the file in a per-session temp dir (through the extraction cache when it is enabled),
+        # never a cache entry itself, which eviction may delete while Blender still points at it
+        dest_path = self.casc_path_to_dest(casc_path, self.get_temp_dir())
+        return dest_path if self.extract_file(casc_path, dest_path) else None
+
+    def get_temp_dir(self):
+        # local_file runs on map_parallel workers, so the temp dir is created once under a lock
+        # the session hands it on to the wrapper it reopens with, Blender may still point at files inside
+        with self.temp_dir_lock:
+            if self.temp_dir is None:
+                self.temp_dir = tempfile.mkdtemp(prefix="sc2_files_")
+            return self.temp_dir
+
+    def read_storage_file(self, casc_path):
+        # whole file read straight into a single bytearray, without an intermediate ctypes buffer copy
+        stream = self.open_file(casc_path, buffered=False)
+        if stream is None:
+            return None
+
+        with stream:
+            content = bytearray(stream.size)
+            view = memoryview(content)
+            offset = 0
+            while offset < stream.size and (bytes_read := stream.readinto(view[offset:])):
+                offset += bytes_read
+
+        return content if offset == stream.size else None
+
+    def casc_path_to_dest(self, casc_path, dest_root):
+        return os.path.join(dest_root, casc_path.replace('\\', os.sep).replace('/', os.sep))
+
+    def map_parallel(self, func, items, workers=None):
+        # CascReadFile releases the GIL, so files opened per task on the shared storage handle overlap
+        items = list(items)
+        workers = min(workers or os.cpu_count() or 1, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="casc") as executor:
+            return list(executor.map(func, items))
+
+    def read_many(self, casc_paths, workers=None):
+        # returns one CascFileResult per path, in input order
+        def read(casc_path):
+            start = time.perf_counter()
+            content = self.read_file_content(casc_path)
+            return CascFileResult(casc_path, content is not None, len(content) if content else 0, time.perf_counter() - start, data=content)
+
+        return self.map_parallel(read, casc_paths, workers)
+
+    def extract_many(self, casc_paths, dest_root, workers=None, dest_paths=None):
+        # files go to dest_root mirroring their CASC path, unless dest_paths (relative to dest_root) is given
+        casc_paths = list(casc_paths)
+        if dest_paths is None:
+            dest_paths = [self.casc_path_to_dest(casc_path, dest_root) for casc_path in casc_paths]
+        else:
+            dest_paths = [os.path.join(dest_root, dest_path) for dest_path in dest_paths]
+
+        def extract(job):
+            casc_path, dest_path = job
+            start = time.perf_counter()
+            success = self.extract_file(casc_path, dest_path)
+            size = os.path.getsize(dest_path) if success else 0
+            return CascFileResult(casc_path, success, size, time.perf_counter() - start, dest_path=dest_path)
+
+        return self.map_parallel(extract, zip(casc_paths, dest_paths), workers)
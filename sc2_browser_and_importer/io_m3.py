@@ -21,10 +21,25 @@
 
 import struct
 import copy
+import gc
+import hashlib
+import mmap
+import operator
+import os
+import pickle
+import random
+import sys
+import time
+from array import array
 from os import path
 from sys import stderr
 from xml.etree import ElementTree as ET
 
+try:
+    import numpy as np
+except ImportError:  # record views of sections are unavailable, everything else works without numpy
+    np = None
+
 primitive_field_info = {
     'uint8': {'format': 'B', 'min': 0, 'max': (1 << 8) - 1},
     'int16': {'format': 'h', 'min': -1 << 15, 'max': (1 << 15) - 1}, 'uint16': {'format': 'H', 'min': 0, 'max': (1 << 16) - 1},
@@ -32,6 +47,15 @@ primitive_field_info = {
     'uint64': {'format': 'Q', 'min': 0, 'max': (1 << 64) - 1}, 'float': {'format': 'f'},
 }
 
+# validation levels, from cheapest to most thorough:
+# OFF only culls empty sections, STRUCTURAL checks instance types, primitive value ranges and reference ranges,
+# SAMPLED additionally checks every field of a random subset of each section, FULL checks every field of every instance
+validation_levels = ('OFF', 'STRUCTURAL', 'SAMPLED', 'FULL')
+VALIDATION_SAMPLE_SIZE = 32
+
+# numpy equivalents of the struct format characters used by primitive fields
+numpy_formats = {'B': '<u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4', 'Q': '<u8', 'f': '<f4'}
+
 
 def structures_from_tree():
 
@@ -95,6 +119,9 @@ def structures_from_tree():
 
         histories[xml_structure_name] = M3StructureHistory(xml_structure_name, version_to_size, all_field_versions)
 
+    for history in histories.values():
+        history.validate()
+
     return histories
 
 
@@ -107,32 +134,45 @@ class M3StructureHistory:
         self.field_versions = field_versions
         self.version_to_size = version_to_size
         self.version_to_description = {}
-        # create all to check sizes
-        for version in version_to_size:
-            self.get_version(version)
 
-    def get_version(self, version, md_version=34):
-        desc_id = f'MD{md_version}_{version}'
-
-        if (desc := self.version_to_description.get(desc_id)) is None:
-            fields = {field.name: field for field_versions in self.field_versions if (field := field_versions.get(version))}
-            if md_version == 33:
-                for field in fields.values():
-                    if type(field) == M3FieldStructure:
-                        new_field_desc_name = 'SmallReference' if field.desc.history.name == 'Reference' else field.desc.history.name
-                        new_field_desc = structures[new_field_desc_name].get_version(field.desc.version, md_version)
-                        fields[field.name] = M3FieldStructure(field.name, new_field_desc, field.ref_to)
+    def __getstate__(self):
+        # the per version field dicts are pickled as (first version, last version, field) ranges to keep the schema cache small
+        field_ranges = [(min(versions), max(versions), versions[min(versions)]) for versions in self.field_versions]
+        return dict(self.__dict__, field_versions=field_ranges)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.field_versions = [{ii: field for ii in range(first, last + 1)} for first, last, field in self.field_versions]
+
+    def version_fields(self, version, md_version=34):
+        fields = {field.name: field for field_versions in self.field_versions if (field := field_versions.get(version))}
+        if md_version == 33:
+            for field in fields.values():
+                if type(field) == M3FieldStructure:
+                    new_field_desc_name = 'SmallReference' if field.desc.history.name == 'Reference' else field.desc.history.name
+                    new_field_desc = structures[new_field_desc_name].get_version(field.desc.version, md_version)
+                    fields[field.name] = M3FieldStructure(field.name, new_field_desc, field.ref_to)
+        return fields
 
+    def validate(self):
+        # checks the calculated size of every version against the specified size, without building descriptions
+        for version, spec_size in self.version_to_size.items():
+            fields = self.version_fields(version)
             calc_size = sum(field.size for field in fields.values())
-            spec_size = self.version_to_size.get(version)
-            if calc_size != spec_size and md_version == 34:  # validate the specified size, but skip if model is not md34
+            if calc_size != spec_size:
                 offset = 0
                 stderr.write(f'Offsets of {self.name} in version {version}:\n')
                 for field in fields:
                     stderr.write(f'{offset}: {fields[field].name}\n')
                     offset += fields[field].size
                 raise Exception(f'Size mismatch: {self.name}V{version} specified={spec_size} calculated={calc_size}')
-            self.version_to_description[desc_id] = (desc := M3StructureDescription(self, version, fields, calc_size))
+
+    def get_version(self, version, md_version=34):
+        # descriptions are built on first use, sizes are checked once by validate when structures.xml is parsed
+        if (desc := self.version_to_description.get((md_version, version))) is None:
+            fields = self.version_fields(version, md_version)
+            desc = M3StructureDescription(self, version, fields, sum(field.size for field in fields.values()))
+            self.version_to_description[(md_version, version)] = desc
 
         return desc
 
@@ -272,23 +312,103 @@ class M3StructureDescription:
         self.version = version
         self.fields = fields
         self.size = size
+        self.codec = None
+        self.dtype = None
+        self.data_class = None
+        self.references = None
 
     def __str__(self):
         return f'{self.history.name}V{self.version}: {{{self.fields}}}'
 
+    def __getstate__(self):
+        # codecs and data classes are generated, so they are rebuilt on first use after unpickling
+        return dict(self.__dict__, codec=None, dtype=None, data_class=None, references=None)
+
+    def reference_fields(self):
+        # (offset, size, getter) of every Reference field, including those of nested structures
+        if self.references is None:
+            self.references = []
+
+            def collect(desc, base_offset, path):
+                offset = base_offset
+                for field in desc.fields.values():
+                    if type(field) == M3FieldStructure:
+                        if field.desc.history.name == 'Reference':
+                            self.references.append((offset, field.size, operator.attrgetter(path + field.name)))
+                        else:
+                            collect(field.desc, offset, path + field.name + '.')
+                    offset += field.size
+
+            collect(self, 0, '')
+        return self.references
+
+    def get_class(self):
+        # M3StructureData subclass holding the fields of this description in slots, with desc as a class attribute
+        # attributes outside the description still go to an instance dict, which is only allocated when used
+        if self.data_class is None:
+            self.data_class = type(f'{self.history.name}V{self.version}', (M3StructureData,), {'__slots__': tuple(self.fields), 'desc': self})
+        return self.data_class
+
+    def get_codec(self):
+        if self.codec is None:
+            self.codec = M3StructureCodec(self)
+        return self.codec
+
+    def get_dtype(self):
+        # numpy dtype with the same packed layout, primitive structures map to their scalar type
+        # nested vectors and matrices, whose single letter component fields share one type (VEC3, QUAT, COL, Matrix44...),
+        # become subarrays, so verts['pos'] has shape (n, 3) and bone matrices (n, 4, 4)
+        if self.dtype is None:
+            if self.history.primitive:
+                self.dtype = np.dtype(numpy_formats[self.fields['value'].struct_format.format[1:]])
+            else:
+                self.dtype = np.dtype([self.field_dtype(field) for field in self.fields.values()])
+            assert self.dtype.itemsize == self.size
+        return self.dtype
+
+    @staticmethod
+    def field_dtype(field):
+        if type(field) == M3FieldStructure:
+            nested_dtype = field.desc.get_dtype()
+            field_types = {nested_dtype.fields[name][0] for name in nested_dtype.names}
+            if len(field_types) == 1 and all(len(name) == 1 for name in nested_dtype.names):
+                field_type = field_types.pop()
+                base, shape = field_type.subdtype or (field_type, ())
+                return (field.name, base, (len(nested_dtype.names), *shape))
+            return (field.name, nested_dtype)
+        if type(field) == M3FieldBytes:
+            return (field.name, '<u1', (field.size,))
+        return (field.name, numpy_formats[field.struct_format.format[1:]])
+
     def instance(self, buffer=None, offset=0):
-        return M3StructureData(self, buffer, offset)
+        return self.get_class()(self, buffer, offset)
+
+    def array_typecode(self):
+        # array typecodes of the primitive value types match their struct format characters
+        return self.fields['value'].struct_format.format[1:]
+
+    def primitive_array(self, values=()):
+        return array(self.array_typecode(), values)
 
     def instances(self, buffer, count):
         if self.history.primitive:
-            return struct.unpack(f'<{count}' + self.fields['value'].struct_format.format[1:], buffer)
+            values = self.primitive_array()
+            values.frombytes(memoryview(buffer)[:count * self.size])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            return values
+        elif not self.size:
+            return [self.instance() for ii in range(count)]
         else:
-            vals = []
-            instance_offset = 0
-            for ii in range(count):
-                vals.append(self.instance(buffer=buffer, offset=instance_offset))
-                instance_offset += self.size
-            return vals
+            codec = self.get_codec()
+            # the collector would otherwise repeatedly traverse the growing list of new instances
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return list(map(codec.make, codec.struct_format.iter_unpack(memoryview(buffer)[:count * self.size])))
+            finally:
+                if gc_enabled:
+                    gc.enable()
 
     def instance_validate(self, instance, instance_name):
         if self.history.primitive:
@@ -301,24 +421,111 @@ class M3StructureDescription:
             for field in self.fields.values():
                 field.content_validate(getattr(instance, field.name), instance_name + '.' + field.name)
 
-    def instances_to_bytearray(self, instances):
-        raw_bytes = bytearray(self.size * len(instances))
-        if self.history.primitive:  # instances of numbers
-            struct.pack_into(f'<{len(instances)}' + self.fields['value'].struct_format.format[1:], raw_bytes, 0, *instances)
-        else:  # instances of M3StructureData
-            offset = 0
+    def instances_validate(self, instances, instance_name, level='FULL', sample_size=VALIDATION_SAMPLE_SIZE):
+        if level == 'OFF':
+            return
+
+        if self.history.primitive:
+            # typed arrays can only hold values of the right type and range
+            if type(instances) == array and instances.typecode == self.array_typecode():
+                return
+            if level != 'FULL':
+                try:
+                    self.primitive_array(instances)
+                except (OverflowError, TypeError) as e:
+                    raise Exception(f'{instance_name}.value {e}')
+                return
+        else:
+            for instance in instances:
+                if instance.desc is not self:
+                    raise TypeError(f'M3 description of {instance_name} {instance} {instance.desc} does not match {self}')
+            if level == 'STRUCTURAL':
+                return
+            if level == 'SAMPLED' and len(instances) > sample_size:
+                instances = random.sample(list(instances), sample_size)
+
+        for instance in instances:
+            self.instance_validate(instance, instance_name)
+
+    def instances_pack_into(self, instances, buffer, offset):
+        if self.history.primitive and type(instances) == array and instances.typecode == self.array_typecode() and sys.byteorder == 'little':
+            buffer[offset:offset + len(instances) * self.size] = memoryview(instances).cast('B')
+        elif self.history.primitive:
+            struct.pack_into(f'<{len(instances)}' + self.fields['value'].struct_format.format[1:], buffer, offset, *instances)
+        else:
+            encode = self.get_codec().encode
             for value in instances:
-                value.to_buffer(raw_bytes, offset)
+                encode(value, buffer, offset)
                 offset += self.size
+
+    def instances_to_bytearray(self, instances):
+        if self.history.primitive and type(instances) == array and instances.typecode == self.array_typecode() and sys.byteorder == 'little':
+            return bytearray(instances)
+        raw_bytes = bytearray(self.size * len(instances))
+        self.instances_pack_into(instances, raw_bytes, 0)
         return raw_bytes
 
 
+class M3StructureCodec:
+    ''' Flattened struct layout of an M3StructureDescription, with generated functions converting between it and M3StructureData '''
+
+    def __init__(self, desc: M3StructureDescription):
+        self.desc = desc
+        self.classes = []
+        self.checks = []
+        formats = []
+        decode_lines = []
+        encode_values = []
+
+        def flatten(desc, target, path):
+            # target names the M3StructureData being decoded, path is its attribute path from the top level instance
+            for field in desc.fields.values():
+                if type(field) == M3FieldStructure:
+                    nested = f'd{len(self.classes)}'
+                    decode_lines.append(f'{nested} = new(classes[{len(self.classes)}])')
+                    self.classes.append(field.desc.get_class())
+                    flatten(field.desc, nested, f'{path}.{field.name}')
+                    decode_lines.append(f'{target}.{field.name} = {nested}')
+                else:
+                    value_index = len(formats)
+                    formats.append(field.struct_format.format[1:])
+                    decode_lines.append(f'{target}.{field.name} = v[{value_index}]')
+                    encode_values.append(f'{path}.{field.name}')
+                    if field.expected_value is not None:
+                        decode_lines.append(f'if v[{value_index}] != checks[{len(self.checks)}][0]: unexpected({len(self.checks)}, v[{value_index}])')
+                        self.checks.append((field.expected_value, f'{desc.history.name}V{desc.version}.{field.name}'))
+
+        flatten(desc, 'd', 'd')
+        self.struct_format = struct.Struct('<' + ''.join(formats))
+
+        decode_body = ''.join(f'\n    {line}' for line in decode_lines)
+        source = '\n'.join([
+            f'def decode(d, v):\n    pass{decode_body}',
+            f'def make(v):\n    d = new(data_class){decode_body}\n    return d',
+            f'def encode(d, buffer, offset):\n    pack_into(buffer, offset, {", ".join(encode_values)})',
+        ])
+        namespace = {'new': object.__new__, 'data_class': desc.get_class(), 'classes': self.classes,
+                     'checks': self.checks, 'unexpected': self.unexpected, 'pack_into': self.struct_format.pack_into}
+        exec(compile(source, f'<M3StructureCodec {desc.history.name}V{desc.version}>', 'exec'), namespace)
+        self.decode = namespace['decode']
+        self.make = namespace['make']
+        self.encode = namespace['encode']
+
+    def unexpected(self, check_index, value):
+        expected_value, field_path = self.checks[check_index]
+        raise Exception(f'{field_path} expected to be {expected_value}, but it was {value}')
+
+
 class M3StructureData:
     ''' Container for M3 structure property values '''
 
-    def __init__(self, desc: M3StructureDescription, buffer=None, offset=0):
-        self.desc = desc
+    # set on the slotted subclass each M3StructureDescription generates, see M3StructureDescription.get_class
+    desc = None
 
+    def __new__(cls, desc: M3StructureDescription = None, buffer=None, offset=0):
+        return object.__new__(desc.get_class() if cls is M3StructureData else cls)
+
+    def __init__(self, desc: M3StructureDescription = None, buffer=None, offset=0):
         if buffer is not None:
             self.from_buffer(buffer, offset)
         else:
@@ -342,16 +549,11 @@ class M3StructureData:
         return data
 
     def from_buffer(self, buffer, offset):
-        field_offset = offset
-        for field in self.desc.fields.values():
-            field.from_buffer(self, buffer, field_offset)
-            field_offset += field.size
+        codec = self.desc.get_codec()
+        codec.decode(self, codec.struct_format.unpack_from(buffer, offset))
 
     def to_buffer(self, buffer, offset):
-        field_offset = offset
-        for field in self.desc.fields.values():
-            field.to_buffer(self, buffer, field_offset)
-            field_offset += field.size
+        self.desc.get_codec().encode(self, buffer, offset)
 
     def bit_get(self, field_name, bit_name):
         field = self.desc.fields[field_name]
@@ -369,6 +571,18 @@ class M3StructureData:
             setattr(self, field_name, int_val ^ mask)
 
 
+def instance_references(instance):
+    # yields every reference of an M3StructureData instance, including references of nested structures
+    # detected by structure type, as some reference fields in structures.xml do not declare ref_to
+    for field in instance.desc.fields.values():
+        if type(field) == M3FieldStructure:
+            value = getattr(instance, field.name)
+            if field.desc.history.name in ('Reference', 'SmallReference'):
+                yield value
+            else:
+                yield from instance_references(value)
+
+
 class M3Field:
     ''' Container for information relating to a specific field in an M3StructureHistory or M3StructureDescription instance '''
 
@@ -400,11 +614,7 @@ class M3FieldStructure(M3Field):
         setattr(data, self.name, self.desc.instance(buffer, offset))
 
     def to_buffer(self, data: M3StructureData, buffer, offset):
-        instance = getattr(data, self.name)
-        instance_offset = offset
-        for field in instance.desc.fields.values():
-            field.to_buffer(instance, buffer, instance_offset)
-            instance_offset += field.size
+        getattr(data, self.name).to_buffer(buffer, offset)
 
     def default_set(self, data: M3StructureData):
         setattr(data, self.name, self.desc.instance())
@@ -413,6 +623,9 @@ class M3FieldStructure(M3Field):
         self.desc.instance_validate(field_content, field_path)
 
 
+struct_formats = {}
+
+
 class M3FieldPrimitive(M3Field):
     ''' Base class for M3FieldBytes, M3FieldInt, M3FieldFloat '''
 
@@ -423,6 +636,16 @@ class M3FieldPrimitive(M3Field):
         self.default_value = default_value
         self.expected_value = expected_value
 
+    def __getstate__(self):
+        return dict(self.__dict__, struct_format=self.struct_format.format)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Struct objects are immutable, so fields with the same format share one
+        if (struct_format := struct_formats.get(self.struct_format)) is None:
+            struct_format = struct_formats[self.struct_format] = struct.Struct(self.struct_format)
+        self.struct_format = struct_format
+
     def from_buffer(self, data: M3StructureData, buffer, offset):
         value = self.struct_format.unpack_from(buffer, offset)[0]
         if self.expected_value is not None and value != self.expected_value:
@@ -474,6 +697,12 @@ class M3FieldFloat(M3FieldPrimitive):
             raise Exception(f'{field_path} {field_content} type is {type(field_content)}, not float')
 
 
+def section_padded_size(section):
+    # sections are followed by as many 0xaa bytes as the remainder of their size divided by 16
+    size = section.desc.size * len(section)
+    return size + size % 16
+
+
 class M3SectionList(list):
     ''' List object for M3Section instances '''
 
@@ -481,11 +710,14 @@ class M3SectionList(list):
         list.__init__(self, [])
         self.filepath = None
         self.file = None
+        self.buffer = None
+        self.buffer_immutable = False
+        self.mmap = None
         self.model = None
         self.md_version = 34
 
     def __getitem__(self, key):
-        if type(key) == M3StructureData:
+        if isinstance(key, M3StructureData):
             item = self[key.index] if key.index and key.entries else []
         else:
             item = super(M3SectionList, self).__getitem__(key)
@@ -517,24 +749,43 @@ class M3SectionList(list):
         return self
 
     @classmethod
-    def load(cls, filepath, lazy=False):
+    def load(cls, filepath, lazy=False, fields=None, use_mmap=False):
+        # filepath may also be a readable, seekable binary file object such as CascWrapper.open_file,
+        # or a bytes-like object whose sections are then decoded from memoryview slices, which are only copied out on
+        # close() when the object is not an immutable bytes (see close)
+        # fields is an optional collection of model reference field names, e.g. {'bones', 'sequences'}, in which case
+        # only the sections reachable from those fields are decoded and the others are left as index entries
+        # use_mmap maps a file path into memory, sections are sliced from the mapping and decoded on first access,
+        # so untouched sections only occupy page cache until close() is called
         self = cls()
-        self.filepath = filepath
+        lazy = lazy or fields is not None or use_mmap
         self.index_entries = []
 
-        f = open(filepath, 'rb')
-        md_tag = f.read(4)[::-1].decode('ascii')
+        if isinstance(filepath, (bytes, bytearray, memoryview)):
+            self.buffer = memoryview(filepath).cast('B')
+            self.buffer_immutable = isinstance(self.buffer.obj, bytes)
+        elif hasattr(filepath, 'read'):
+            self.file = filepath
+            self.filepath = getattr(filepath, 'name', None)
+        elif use_mmap:
+            with open(filepath, 'rb') as f:
+                # the mapping stays valid after the file is closed
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.buffer = memoryview(self.mmap)
+            self.filepath = filepath
+        else:
+            self.file = open(filepath, 'rb')
+            self.filepath = filepath
+
+        md_tag = bytes(self.read_range(0, 4))[::-1].decode('ascii')
         self.md_version = int(md_tag[2:])
-        f.seek(0)
         m3_header = structures[md_tag].get_version(11)
-        header = m3_header.instance(f.read(m3_header.size))
-        f.seek(header.index_offset)
+        header = m3_header.instance(self.read_range(0, m3_header.size))
         mdie = structures['MDIndexEntry'].get_version(self.md_version)
+        index_buffer = self.read_range(header.index_offset, header.index_size * mdie.size)
 
-        self.file = f
-
-        for entry_buffer in [f.read(mdie.size) for ii in range(header.index_size)]:
-            index_entry = mdie.instance(entry_buffer)
+        for ii in range(header.index_size):
+            index_entry = mdie.instance(index_buffer, ii * mdie.size)
             tag_str = index_entry.tag.to_bytes(4, 'little').decode('ascii').replace('\x00', '')[::-1]
             desc = structures[tag_str].get_version(index_entry.version, self.md_version)
 
@@ -545,14 +796,33 @@ class M3SectionList(list):
             self.append(self.section_from_index_entry(index_entry) if not lazy else None)
 
         if not lazy:
-            f.close()
-            self.file = None
+            self.close()
 
         self.model = self[self[0][0].model][0]
 
+        if fields is not None:
+            self.load_reachable(fields)
+
         return self
 
-    def save(self, filepath=None):
+    def load_reachable(self, fields):
+        # decodes the sections referenced by the given model fields, following ref_to links transitively
+        # model fields not present in the model's version are skipped
+        pending = [getattr(self.model, field) for field in fields if field in self.model.desc.fields]
+        visited = set()
+        while pending:
+            reference = pending.pop()
+            if not reference.index or not reference.entries or reference.index in visited:
+                continue
+            visited.add(reference.index)
+            section = self[reference.index]
+            if not section.desc.history.primitive:
+                for instance in section:
+                    pending.extend(instance_references(instance))
+        return visited
+
+    def layout(self):
+        # sizing pass, sets the index entry of every section and the header's index position, returns the file size
         buffer_offset = 0
         for section in self:
             section.index_entry = structures['MDIndexEntry'].get_version(34).instance()
@@ -560,34 +830,97 @@ class M3SectionList(list):
             section.index_entry.offset = buffer_offset
             section.index_entry.repetitions = len(section)
             section.index_entry.version = section.desc.version
-            section.raw_bytes = section.desc.instances_to_bytearray(section.content)
-            section.raw_bytes.extend([0xaa for ii in range(0, len(section.raw_bytes) % 16)])
-            buffer_offset += len(section.raw_bytes)
+            buffer_offset += section_padded_size(section)
 
         self[0][0].index_offset = buffer_offset
         self[0][0].index_size = len(self)
-        self[0].raw_bytes = self[0].desc.instances_to_bytearray(self[0])
-        self[0].raw_bytes.extend([0xaa for ii in range(0, len(self[0].raw_bytes) % 16)])
+        return buffer_offset + 16 * len(self)
 
+    def save(self, filepath=None):
+        # streams the sections to a file path or writable binary file object, encoding one section at a time
         if filepath is None:
             filepath = self.filepath
 
-        with open(filepath, 'w+b') as f:
-            index_buffer = bytearray(16 * len(self))
-            prev_section = None
-            for ii, section in enumerate(self):
-                if section.index_entry.offset != f.tell():
-                    raise Exception(f'Section length: {prev_section.index_entry} with length {len(prev_section.raw_bytes)} followed by {section.index_entry}')
-                section.index_entry.to_buffer(index_buffer, 16 * ii)
-                f.write(section.raw_bytes)
-                prev_section = section
-            f.write(index_buffer)
+        if hasattr(filepath, 'write'):
+            self.write_to(filepath)
+        else:
+            with open(filepath, 'w+b') as f:
+                self.write_to(f)
+
+    def write_to(self, f):
+        self.layout()
+        index_buffer = bytearray(16 * len(self))
+        for ii, section in enumerate(self):
+            section_bytes = section.desc.instances_to_bytearray(section.content)
+            section_bytes.extend(b'\xaa' * (section_padded_size(section) - len(section_bytes)))
+            f.write(section_bytes)
+            section.index_entry.to_buffer(index_buffer, 16 * ii)
+        f.write(index_buffer)
+
+    def save_to_bytes(self):
+        buffer = bytearray(self.layout())
+        self.pack_into(buffer)
+        return buffer
+
+    def pack_into(self, buffer, offset=0):
+        # writes the model into a writable buffer such as a bytearray or mmap, sized and positioned by a prior layout() call
+        view = memoryview(buffer).cast('B')
+        for section in self:
+            section_offset = offset + section.index_entry.offset
+            size = section.desc.size * len(section)
+            section.desc.instances_pack_into(section.content, view, section_offset)
+            view[section_offset + size:section_offset + section_padded_size(section)] = b'\xaa' * (size % 16)
+
+        index_offset = offset + self[0][0].index_offset
+        for ii, section in enumerate(self):
+            section.index_entry.to_buffer(view, index_offset + 16 * ii)
+
+    def read_range(self, offset, size):
+        if self.buffer is not None:
+            return self.buffer[offset:offset + size]
+        if self.file is None:
+            raise ValueError('M3 data is closed, sections that were not loaded can no longer be read')
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    def close(self):
+        # releases the source file or mapping of a lazy load, sections that were not loaded become unreadable
+        # raw_bytes of loaded sections are copied out of the mapping first, as the mapping cannot close while viewed
+        # numpy arrays from M3Section.array_view still viewing the mapping keep it open until they are freed
+        # slices of an immutable bytes source are kept as they are, they keep the bytes alive and cannot change
+        if self.buffer is not None and self.buffer_immutable:
+            self.buffer = None
+        if self.buffer is not None:
+            for section in list.__iter__(self):
+                if section is not None and type(section.raw_bytes) == memoryview:
+                    raw_view = section.raw_bytes
+                    section.raw_bytes = raw_view.tobytes()
+                    try:
+                        raw_view.release()
+                    except BufferError:
+                        pass
+            self.buffer.release()
+            self.buffer = None
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                pass
+            self.mmap = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def section_from_index_entry(self, index_entry):
         tag_str = index_entry.tag.to_bytes(4, 'little').decode('ascii').replace('\x00', '')[::-1]
         desc = structures[tag_str].get_version(index_entry.version, self.md_version)
-        self.file.seek(index_entry.offset)
-        section_buffer = self.file.read(index_entry.repetitions * desc.size)
+        section_buffer = self.read_range(index_entry.offset, index_entry.repetitions * desc.size)
         section = M3Section(desc=desc, index_entry=index_entry, references=[], content=desc.instances(buffer=section_buffer, count=index_entry.repetitions))
         section.raw_bytes = section_buffer
         return section
@@ -601,17 +934,31 @@ class M3SectionList(list):
 
         return section
 
-    def validate(self):
+    def validate(self, level='FULL', sample_size=VALIDATION_SAMPLE_SIZE):
+        # level is one of validation_levels, empty sections are culled at every level
+        # reference ranges are checked separately by validate_references, once references are resolved
         culled_sections = 0
         for ii in range(len(self)):
             section = self[ii - culled_sections]
             if len(section):
-                for instance in section:
-                    section.desc.instance_validate(instance, section.desc.history.name)
+                section.desc.instances_validate(section.content, section.desc.history.name, level, sample_size)
             else:
                 del self[ii - culled_sections]
                 culled_sections += 1
 
+    def validate_references(self):
+        # resolved references must point at an existing section holding the referenced number of entries
+        for ii, section in enumerate(self):
+            if section.desc.history.primitive or not (reference_fields := section.desc.reference_fields()):
+                continue
+            for instance in section:
+                for offset, size, get_reference in reference_fields:
+                    reference = get_reference(instance)
+                    if not reference.index:
+                        continue
+                    if reference.index >= len(self) or reference.entries > len(self[reference.index]):
+                        raise Exception(f'{section.desc.history.name} in section {ii} references {reference.entries} entries of section {reference.index}, out of range')
+
     def resolve(self):
         aggregate_references = set()
         for ii, section in enumerate(self):
@@ -623,7 +970,7 @@ class M3SectionList(list):
                 reference.entries = len(section)
 
     def data_eq(self, data, other):
-        if type(data) != M3StructureData:
+        if not isinstance(data, M3StructureData):
             return data == other
 
         for field in data.desc.fields.values():
@@ -657,37 +1004,57 @@ class M3SectionList(list):
             return False
         if len(section.content) != len(other.content):
             return False
+        if type(section.content) == array and type(other.content) == array:
+            return section.content == other.content
         for ii in range(len(section.content)):
             if not self.data_eq(section.content[ii], other.content[ii]):
                 return False
         return True
 
+    def section_fingerprints(self):
+        # content hash of every section, from its bytes with reference fields masked out and replaced by the
+        # hashes of the referenced sections, so equal fingerprints mean equal sections in the sense of section_eq
+        fingerprints = [None] * len(self)
+
+        def fingerprint(ii):
+            if fingerprints[ii] is None:
+                section = self[ii]
+                desc = section.desc
+                sha1 = hashlib.sha1(f'{desc.history.name}V{desc.version}:{len(section)}'.encode('ascii'))
+                raw_bytes = desc.instances_to_bytearray(section.content)
+                if not desc.history.primitive and (reference_fields := desc.reference_fields()):
+                    for jj, instance in enumerate(section):
+                        instance_offset = jj * desc.size
+                        for offset, size, get_reference in reference_fields:
+                            raw_bytes[instance_offset + offset:instance_offset + offset + size] = bytes(size)
+                            index = get_reference(instance).index
+                            # empty references all point at index 0, the header is not followed
+                            sha1.update(fingerprint(index) if index else b'\x00')
+                sha1.update(raw_bytes)
+                fingerprints[ii] = sha1.digest()
+            return fingerprints[ii]
+
+        return [fingerprint(ii) for ii in range(len(self))]
+
     def factor_sections(self):
-        excluded_sections = []
+        excluded_sections = set()
 
         if self.model and self.model.desc.version >= 23:  # using the same section for both of these breaks attachment volumes
-            excluded_sections.append(self[self.model.attachment_volumes_addon0])
-            excluded_sections.append(self[self.model.attachment_volumes_addon1])
+            for reference in (self.model.attachment_volumes_addon0, self.model.attachment_volumes_addon1):
+                if reference.index and reference.entries:
+                    excluded_sections.add(reference.index)
 
-        matched_sections = []
+        # each section is merged into the first equal section before it, excluded sections are never merged into
         matched_sections_map = {}
-        for ii, section in enumerate(self):
-
-            if section in matched_sections:
+        representatives = {}
+        for ii, fingerprint in enumerate(self.section_fingerprints()):
+            if (representative := representatives.get(fingerprint)) is not None:
+                matched_sections_map[ii] = representative
                 continue
 
-            matched_sections.append(section)
             matched_sections_map[ii] = ii
-
-            if section in excluded_sections:
-                continue
-
-            for jj, section_comp in enumerate(self):
-                if section_comp in matched_sections:
-                    continue
-                if self.section_eq(section, section_comp):
-                    matched_sections.append(section_comp)
-                    matched_sections_map[jj] = ii
+            if ii not in excluded_sections:
+                representatives[fingerprint] = ii
 
         remaining_sections = sorted([key for key, val in matched_sections_map.items() if val == key])
         sections_to_delete = sorted([key for key, val in matched_sections_map.items() if val != key], reverse=True)
@@ -696,13 +1063,14 @@ class M3SectionList(list):
             return
 
         # resolve reference indexes again after determining the adjusted indexes
+        remaining_positions = {section_index: pos for pos, section_index in enumerate(remaining_sections)}
         aggregate_references = set()
         for ii, section in enumerate(self):
             for reference in section.references:
                 if reference in aggregate_references:
                     raise Exception('Cannot have reference index referenced by more than one section', reference, section.references)
                 aggregate_references.add(reference)
-                reference.index = remaining_sections.index(matched_sections_map[ii])
+                reference.index = remaining_positions[matched_sections_map[ii]]
                 reference.entries = len(section)
 
         for ii in sections_to_delete:
@@ -710,13 +1078,13 @@ class M3SectionList(list):
 
 
 class M3Section:
-    ''' Container for M3StructureData (or primitive) instances '''
+    ''' Container for M3StructureData (or primitive) instances, primitive values are kept in a typed array '''
 
     def __init__(self, desc: M3StructureDescription, index_entry: M3StructureData, references: list, content: list):
         self.desc = desc
         self.index_entry = index_entry
         self.references = references
-        self.content = content
+        self.content = desc.primitive_array(content) if desc and desc.history.primitive and type(content) != array else content
         self.raw_bytes = None
 
     def __str__(self):
@@ -741,13 +1109,143 @@ class M3Section:
         if not instances and not self.desc.history.primitive:
             self.content.append(instance := self.desc.instance())
             return instance
-        self.content += instances
+        self.content.extend(instances)
+
+    def array_view(self, desc=None, writable=False):
+        # zero-copy numpy record view of the section bytes, optionally reinterpreted with another description,
+        # such as M3StructureDescription.get_vertex_description for the U8__ vertex section
+        # writes to a writable view change raw_bytes, content_from_raw_bytes applies them to the content
+        desc = desc or self.desc
+        if self.raw_bytes is None:
+            self.raw_bytes = self.desc.instances_to_bytearray(self.content)
+        elif writable and (type(self.raw_bytes) == bytes or (type(self.raw_bytes) == memoryview and self.raw_bytes.readonly)):
+            self.raw_bytes = bytearray(self.raw_bytes)
+        count = len(self.content) * self.desc.size // desc.size if desc.size else 0
+        return np.frombuffer(self.raw_bytes, dtype=desc.get_dtype(), count=count)
+
+    def content_from_raw_bytes(self):
+        self.content = self.desc.instances(buffer=memoryview(self.raw_bytes)[:len(self.content) * self.desc.size], count=len(self.content))
 
     def content_to_string(self):
-        return ''.join(chr(c) for c in self.content if c != 0)
+        return bytes(self.content).replace(b'\x00', b'').decode('latin-1')
 
     def content_from_string(self, string):
-        self.content = [ord(c) for c in string] + [0x00]
+        self.content = self.desc.primitive_array(string.encode('latin-1') + b'\x00')
+
+
+def structures_load():
+    # builds the schema from structures.xml, or unpickles it from __pycache__ while both the xml
+    # and this module, which defines the pickled classes, are unchanged
+    base_dir = path.dirname(__file__)
+    cache_hash = hashlib.sha1()
+    for source_path in (path.join(base_dir, 'structures.xml'), __file__):
+        with open(source_path, 'rb') as f:
+            cache_hash.update(f.read())
+    cache_key = cache_hash.hexdigest()
+    cache_path = path.join(base_dir, '__pycache__', 'structures.schema.pickle')
+
+    try:
+        with open(cache_path, 'rb') as f:
+            if pickle.load(f) == cache_key:
+                return pickle.load(f)
+    except Exception:  # missing, stale or unreadable cache, rebuilt below
+        pass
+
+    histories = structures_from_tree()
+    try:
+        os.makedirs(path.dirname(cache_path), exist_ok=True)
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(cache_key, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(histories, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:  # read-only add-on directory, the schema is just parsed again next time
+        pass
 
+    return histories
+
+
+structures = structures_load()
+
+
+if __name__ == '__main__':
+    # startup benchmark: python3 io_m3.py
+    runs = 20
+    start = time.perf_counter()
+    for ii in range(runs):
+        structures_from_tree()
+    parse_time = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    for ii in range(runs):
+        structures_load()
+    cache_time = (time.perf_counter() - start) / runs
+
+    print(f'structures.xml parse: {parse_time * 1000:.1f}ms, schema cache load: {cache_time * 1000:.1f}ms')
+
+    # section deduplication benchmark: factor_sections against the pairwise section_eq search it replaced,
+    # on generated material-heavy models, both must produce the same file
+    def factor_sections_pairwise(m3):
+        excluded_sections = []
+        if m3.model and m3.model.desc.version >= 23:
+            excluded_sections.append(m3[m3.model.attachment_volumes_addon0])
+            excluded_sections.append(m3[m3.model.attachment_volumes_addon1])
+
+        matched_sections = []
+        matched_sections_map = {}
+        for ii, section in enumerate(m3):
+            if section in matched_sections:
+                continue
+            matched_sections.append(section)
+            matched_sections_map[ii] = ii
+            if section in excluded_sections:
+                continue
+            for jj, section_comp in enumerate(m3):
+                if section_comp in matched_sections:
+                    continue
+                if m3.section_eq(section, section_comp):
+                    matched_sections.append(section_comp)
+                    matched_sections_map[jj] = ii
 
-structures = structures_from_tree()
+        remaining_sections = sorted([key for key, val in matched_sections_map.items() if val == key])
+        sections_to_delete = sorted([key for key, val in matched_sections_map.items() if val != key], reverse=True)
+        for ii, section in enumerate(m3):
+            for reference in section.references:
+                reference.index = remaining_sections.index(matched_sections_map[ii])
+                reference.entries = len(section)
+        for ii in sections_to_delete:
+            del m3[ii]
+
+    def material_model(material_count, seed):
+        rng = random.Random(seed)
+        m3 = M3SectionList.new('Benchmark', 30)
+        material_section = m3.section_for_reference(m3.model, 'materials_standard', version=19)
+        for ii in range(material_count):
+            material = material_section.content_add()
+            m3.section_for_reference(material, 'name').content_from_string(f'Material{ii % 7}')
+            for layer_name in ('layer_diff', 'layer_norm', 'layer_spec', 'layer_emis1'):
+                layer = m3.section_for_reference(material, layer_name, version=26).content_add()
+                layer.uv_source = rng.randint(0, 1)
+                if rng.random() < 0.8:
+                    m3.section_for_reference(layer, 'color_bitmap').content_from_string(f'Assets/Textures/t{rng.randint(0, 20)}.dds')
+        m3.section_for_reference(m3.model, 'attachment_volumes_addon0').content_add()
+        m3.section_for_reference(m3.model, 'attachment_volumes_addon1').content_add()
+        m3.resolve()
+        return m3
+
+    for material_count in (50, 200):
+        pairwise_m3 = material_model(material_count, material_count)
+        fingerprint_m3 = material_model(material_count, material_count)
+        section_count = len(pairwise_m3)
+
+        start = time.perf_counter()
+        factor_sections_pairwise(pairwise_m3)
+        pairwise_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fingerprint_m3.factor_sections()
+        fingerprint_time = time.perf_counter() - start
+
+        identical = pairwise_m3.save_to_bytes() == fingerprint_m3.save_to_bytes()
+        print(f'factor_sections, {section_count} -> {len(fingerprint_m3)} sections: pairwise {pairwise_time * 1000:.1f}ms, '
+              f'fingerprints {fingerprint_time * 1000:.1f}ms, identical output: {identical}')
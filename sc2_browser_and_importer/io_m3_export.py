@@ -1150,12 +1150,15 @@ class Exporter():
         if self.bl_op.output_anims or self.is_m3a:
             self.finalize_anim_data(model)
 
-        self.m3.validate()
+        self.m3.validate(self.bl_op.validation_level)
         self.m3.resolve()
 
         if self.bl_op.section_reuse_mode == 'FACTORED':
             self.m3.factor_sections()
 
+        if self.bl_op.validation_level != 'OFF':
+            self.m3.validate_references()
+
         self.m3.save(filepath)
 
         return self.m3
@@ -1811,7 +1814,6 @@ class Exporter():
 
                         vertex_lookups_used = max(vertex_lookups_used, len(deformations))
 
-                        m3_vertex_desc.instance_validate(m3_vert, 'vertex')
                         region_vertices.append(m3_vert)
                         region_vert_count += 1
 
@@ -1821,6 +1823,8 @@ class Exporter():
                 self.warn_strings.append(f'{str(ob)} has at least one vertex with no weight given to a valid bone and will not be exported')
                 continue
 
+            m3_vertex_desc.instances_validate(region_vertices, 'vertex', self.bl_op.validation_level)
+
             first_vertex_index = len(m3_vertices)
             m3_vertices.extend(region_vertices)
 
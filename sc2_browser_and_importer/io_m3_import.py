@@ -22,6 +22,7 @@ import os
 import bpy
 import bmesh
 import mathutils
+import numpy as np
 from . import io_m3
 from . import io_shared
 from . import shared
@@ -35,11 +36,18 @@ def to_bl_frame(m3_ms):
     return round(m3_ms / 1000 * FRAME_RATE)
 
 
-def to_bl_uv(m3_uv, uv_multiply, uv_offset):
-    return (
-        m3_uv.x * uv_multiply / 32768 + uv_offset,
-        -m3_uv.y * uv_multiply / 32768 - uv_offset + 1
-    )
+def srgb_to_linear(values):
+    # inverse of the conversion byte color attributes apply when their linear color property is set
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def to_bl_uvs(m3_uvs, uv_multiply, uv_offset):
+    # flat float32 uv data of an (n, 2) array of M3 uv coordinates
+    m3_uvs = m3_uvs.astype(np.float64)
+    uvs = np.empty(m3_uvs.shape, dtype=np.float32)
+    uvs[:, 0] = m3_uvs[:, 0] * uv_multiply / 32768 + uv_offset
+    uvs[:, 1] = -m3_uvs[:, 1] * uv_multiply / 32768 - uv_offset + 1
+    return uvs.ravel()
 
 
 def to_bl_vec2(m3_vector):
@@ -71,6 +79,147 @@ def to_bl_matrix(m3_matrix):
     ))
 
 
+def m3_vertex_columns(m3_verts, props):
+    # float64 columns of the given fields of a vertex record array, vector fields spread over several columns
+    return np.column_stack([m3_verts[prop].reshape(len(m3_verts), math.prod(m3_verts[prop].shape[1:])).astype(np.float64) for prop in props])
+
+
+def m3_vertex_dedup(m3_verts, props):
+    # indices of the first vertex of every distinct combination of the given fields, in order of appearance,
+    # and the index of each vertex among those. the fields are packed into one opaque key per vertex, so a single sort finds them
+    keys = np.empty(len(m3_verts), dtype=[(prop, m3_verts.dtype.fields[prop][0]) for prop in props])
+    for prop in props:
+        keys[prop] = m3_verts[prop]
+        if keys[prop].dtype.kind == 'f':
+            keys[prop] += 0.0  # -0.0 becomes 0.0, the keys compared equal as numbers
+    first, inverse = np.unique(keys.view(np.dtype((np.void, keys.dtype.itemsize))), return_index=True, return_inverse=True)[1:]
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()]
+
+
+def tris_new_mask(tris):
+    # triangles bmesh.faces.new accepts when adding them in order, skipping degenerate ones and repeated vertex sets
+    valid = np.flatnonzero((tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 2] != tris[:, 0]))
+    first = np.unique(np.sort(tris[valid], axis=1), axis=0, return_index=True)[1]
+    mask = np.zeros(len(tris), dtype=bool)
+    mask[valid[first]] = True
+    return mask
+
+
+def tris_edges(tris, vert_count):
+    # edges in the order and direction bmesh creates them for new faces, (c, a), (a, b), (b, c) per triangle,
+    # and the edge index of each loop, which runs from its vertex to the next one of the face
+    corner_edges = tris[:, [2, 0, 0, 1, 1, 2]].reshape(-1, 2)
+    keys = corner_edges.min(axis=1) * vert_count + corner_edges.max(axis=1)
+    first, inverse = np.unique(keys, return_index=True, return_inverse=True)[1:]
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    edges = corner_edges[first[order]]
+    loop_edges = rank[inverse].reshape(-1, 3)[:, [1, 2, 0]].ravel()
+    return edges, loop_edges
+
+
+def coincident_roots(positions):
+    # disjoint set of vertices sharing a position, flattened so that every vertex points at the lowest index of its set,
+    # which is the vertex bmesh find_doubles keeps. positions are matched on a grid of its 0.00001 distance
+    cells = np.unique(np.round(positions.astype(np.float64) / 0.00001).astype(np.int64), axis=0, return_inverse=True)[1].ravel()
+    roots = np.full(len(positions), len(positions), dtype=np.int64)
+    np.minimum.at(roots, cells, np.arange(len(positions)))
+    return roots[cells]
+
+
+def seam_weld_map(positions, edges, loop_edges, lookup_weights):
+    # vertex each vertex is welded into, and the sharp flag of each edge. boundary edges touching a coincident vertex are sharp,
+    # coincident vertices are welded into the root of their set if they share a sharp edge with it, or with another vertex of the set,
+    # and have the same skin weights
+    roots = coincident_roots(positions)
+    doubled = np.bincount(roots, minlength=len(positions))[roots] > 1
+    edge_sharp = (np.bincount(loop_edges, minlength=len(edges)) == 1) & doubled[edges].any(axis=1)
+    weld_map = np.arange(len(positions))
+
+    members = np.flatnonzero(doubled)
+    if not len(members):
+        return weld_map, edge_sharp
+
+    # edges compare by the exact positions of their ends, edges of a vertex are visited in order of creation
+    pos_ids = np.unique(positions, axis=0, return_inverse=True)[1].ravel().tolist()
+    link_edges = {v: [] for v in members.tolist()}
+    for ii in np.flatnonzero(doubled[edges].any(axis=1)).tolist():
+        v0, v1 = edges[ii].tolist()
+        if v0 in link_edges:
+            link_edges[v0].append((v1, ii))
+        if v1 in link_edges:
+            link_edges[v1].append((v0, ii))
+
+    edge_sharp_list = edge_sharp.tolist()
+
+    def edges_match(origin, target):
+        # sharp flag of the first target edge lying on an origin edge
+        for other, _ in link_edges[origin]:
+            for target_other, target_edge in link_edges[target]:
+                if len({pos_ids[origin], pos_ids[other], pos_ids[target], pos_ids[target_other]}) == 2:
+                    return edge_sharp_list[target_edge]
+        return False
+
+    clusters = {}
+    for v, root in zip(members.tolist(), roots[members].tolist()):
+        clusters.setdefault(root, []).append(v)
+
+    for root, cluster in clusters.items():
+        matches = {(origin, target): edges_match(origin, target) for origin in cluster for target in cluster if origin != target}
+        for v in cluster[1:]:
+            others = [other for other in cluster if other not in (v, root)]
+            if not matches[v, root] and not any(matches[root, other] for other in others):
+                continue
+            if not matches[root, v] and not any(matches[v, other] for other in others):
+                continue
+            if lookup_weights[v] == lookup_weights[root]:
+                weld_map[v] = root
+
+    return weld_map, edge_sharp
+
+
+def weld_apply(weld_map, tris, edges, loop_edges, edge_sharp):
+    # welds vertices as bmesh weld_verts does. untouched edges keep their place and new edges follow,
+    # merged edges stay sharp only if all of them were, faces collapsing or repeating an existing face are dropped
+    vert_count = len(weld_map)
+    verts_kept = weld_map == np.arange(vert_count)
+    vert_index = np.cumsum(verts_kept) - 1
+
+    mapped_edges = weld_map[edges]
+    live_edges = np.flatnonzero(mapped_edges[:, 0] != mapped_edges[:, 1])
+    edge_keys = np.sort(mapped_edges[live_edges], axis=1) @ np.array([vert_count, 1])
+    edge_keys, edge_inverse = np.unique(edge_keys, return_inverse=True)
+    changed = (mapped_edges[live_edges] != edges[live_edges]).any(axis=1)
+    first = np.full(len(edge_keys), 2 * len(edges))
+    np.minimum.at(first, edge_inverse, np.where(changed, len(edges) + live_edges, live_edges))
+    order = np.argsort(first)
+    edge_rank = np.empty_like(order)
+    edge_rank[order] = np.arange(len(order))
+    edge_index = np.full(len(edges), -1)
+    edge_index[live_edges] = edge_rank[edge_inverse]
+    welded_edges = vert_index[mapped_edges[first[order] % len(edges)]]
+    welded_sharp = ~(np.bincount(edge_inverse, weights=~edge_sharp[live_edges], minlength=len(edge_keys)) > 0)[order]
+
+    mapped_tris = weld_map[tris]
+    marked = (mapped_tris != tris).any(axis=1)
+    valid = (mapped_tris[:, 0] != mapped_tris[:, 1]) & (mapped_tris[:, 1] != mapped_tris[:, 2]) & (mapped_tris[:, 2] != mapped_tris[:, 0])
+    candidates = np.flatnonzero(valid)
+    face_ids = np.unique(np.sort(mapped_tris[candidates], axis=1), axis=0, return_inverse=True)[1].ravel()
+    first = np.full(len(candidates), 2 * len(tris))
+    np.minimum.at(first, face_ids, np.where(marked[candidates], len(tris) + candidates, candidates))
+    faces_kept = np.zeros(len(tris), dtype=bool)
+    faces_kept[first[first < 2 * len(tris)] % len(tris)] = True
+
+    welded_tris = vert_index[mapped_tris[faces_kept]]
+    welded_loop_edges = edge_index[loop_edges.reshape(-1, 3)[faces_kept]].ravel()
+    loops_kept = np.repeat(faces_kept, 3)
+    return verts_kept, welded_tris, welded_edges, welded_sharp, welded_loop_edges, loops_kept
+
+
 class M3InputProcessor:
 
     def __init__(self, importer, bl, m3):
@@ -194,72 +343,156 @@ class M3InputProcessor:
         key_fcurves(self.importer.stc_id_data, self.bl, field, anim_ref.header, default)
 
 
-def m3_key_collect_evnt(key_frames, key_values):
-    pass  # handle these specially
-
+def m3_key_frames(key_ms):
+    # blender frames of M3 key times and the indices of the keys they drop, of keys landing on the same frame the last one is kept
+    frames = np.round(np.asarray(key_ms, dtype=np.float64) / 1000 * FRAME_RATE).astype(np.int64)
+    if np.all(frames[1:] >= frames[:-1]):
+        ignored_indices = np.flatnonzero(frames[1:] == frames[:-1])
+        return np.delete(frames, ignored_indices), ignored_indices
 
-def m3_key_collect_real(key_frames, key_values):
-    ll = ([],)
+    # unordered key times, a frame seen before replaces the last one
+    frame_list = []
+    ignored_indices = []
+    for ii, frame in enumerate(frames.tolist()):
+        if frame not in frame_list:
+            frame_list.append(frame)
+        else:
+            frame_list[-1] = frame
+            ignored_indices.append(ii - 1)
+    return np.array(frame_list, dtype=np.int64), np.array(ignored_indices, dtype=np.int64)
 
-    for key_frame, key_value in zip(key_frames, key_values):
-        ll[0].extend((key_frame, key_value))
 
-    return ll
+def m3_key_columns(key_values, *fields):
+    # (keys, fields) array of the given fields of a structured key array
+    if not len(key_values):
+        return np.zeros((0, len(fields)))
+    return np.column_stack([key_values[field] for field in fields])
 
 
-def m3_key_collect_vec2(key_frames, key_values):
-    ll = ([], [])
+def m3_key_interleave(key_frames, key_values):
+    # keyframe co data, [frame, value, frame, value, ...], for each column of a (keys, components) array
+    count = min(len(key_frames), len(key_values))
+    co = np.empty((key_values.shape[1], count, 2), dtype=np.float32)
+    co[:, :, 0] = key_frames[:count]
+    co[:, :, 1] = key_values[:count].T
+    return tuple(co.reshape(key_values.shape[1], count * 2))
 
-    for key_frame, key_value in zip(key_frames, key_values):
-        ll[0].extend((key_frame, key_value.x))
-        ll[1].extend((key_frame, key_value.y))
 
-    return ll
+def m3_key_collect_evnt(key_frames, key_values):
+    pass  # handle these specially
 
 
-def m3_key_collect_vec3(key_frames, key_values):
-    ll = ([], [], [])
+def m3_key_collect_real(key_frames, key_values):
+    return m3_key_interleave(key_frames, np.reshape(key_values, (-1, 1)))
 
-    for key_frame, key_value in zip(key_frames, key_values):
-        ll[0].extend((key_frame, key_value.x))
-        ll[1].extend((key_frame, key_value.y))
-        ll[2].extend((key_frame, key_value.z))
 
-    return ll
+def m3_key_collect_vec2(key_frames, key_values):
+    return m3_key_interleave(key_frames, m3_key_columns(key_values, 'x', 'y'))
 
 
-def m3_key_collect_quat(key_frames, key_values):
-    ll = ([], [], [], [])
+def m3_key_collect_vec3(key_frames, key_values):
+    return m3_key_interleave(key_frames, m3_key_columns(key_values, 'x', 'y', 'z'))
 
-    for key_frame, key_value in zip(key_frames, key_values):
-        ll[0].extend((key_frame, key_value.w))
-        ll[1].extend((key_frame, key_value.x))
-        ll[2].extend((key_frame, key_value.y))
-        ll[3].extend((key_frame, key_value.z))
 
-    return ll
+def m3_key_collect_quat(key_frames, key_values):
+    return m3_key_interleave(key_frames, m3_key_columns(key_values, 'w', 'x', 'y', 'z'))
 
 
 def m3_key_collect_colo(key_frames, key_values):
-    ll = ([], [], [], [])
-
-    for key_frame, key_value in zip(key_frames, key_values):
-        ll[0].append(key_frame)
-        ll[0].append(key_value.r / 255)
-        ll[1].append(key_frame)
-        ll[1].append(key_value.g / 255)
-        ll[2].append(key_frame)
-        ll[2].append(key_value.b / 255)
-        ll[3].append(key_frame)
-        ll[3].append(key_value.a / 255)
-
-    return ll
+    return m3_key_interleave(key_frames, m3_key_columns(key_values, 'r', 'g', 'b', 'a') / 255)
 
 
 def m3_key_collect_bnds(key_frames, key_values):
     pass  # handle these specially
 
 
+def m3_key_split(co_data):
+    # key frames and (keys, components) values of interleaved keyframe co data
+    co = np.array(co_data, dtype=np.float64).reshape(len(co_data), len(co_data[0]) // 2, 2)
+    return co[0, :, 0], co[:, :, 1].T
+
+
+def keys_lerp(key_frames, key_values, frames):
+    # linear interpolation of (keys, components) values at the given frames, constant outside of the keys
+    if not len(key_frames):
+        return np.zeros((len(frames), key_values.shape[1]))
+    return np.column_stack([np.interp(frames, key_frames, column) for column in key_values.T])
+
+
+def keys_slerp(key_frames, key_quats, frames):
+    # normalized spherical interpolation of (keys, 4) w, x, y, z quaternions at the given frames, constant outside of the keys
+    if not len(key_frames):
+        return np.zeros((len(frames), 4))
+
+    lengths = np.linalg.norm(key_quats, axis=1, keepdims=True)
+    key_quats = key_quats / np.where(lengths > 0, lengths, 1)
+    if len(key_frames) == 1:
+        return np.repeat(key_quats, len(frames), axis=0)
+
+    index = np.clip(np.searchsorted(key_frames, frames, side='right') - 1, 0, len(key_frames) - 2)
+    t = np.clip((frames - key_frames[index]) / (key_frames[index + 1] - key_frames[index]), 0, 1)[:, None]
+    q0 = key_quats[index]
+    q1 = key_quats[index + 1]
+    dot = np.sum(q0 * q1, axis=1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)  # along the shorter arc
+    theta = np.arccos(np.clip(np.abs(dot), 0, 1))
+    sin_theta = np.sin(theta)
+    near = sin_theta < 1e-6  # nearly equal keys are interpolated linearly
+    sin_theta = np.where(near, 1, sin_theta)
+    quats = np.where(near, 1 - t, np.sin((1 - t) * theta) / sin_theta) * q0 + np.where(near, t, np.sin(t * theta) / sin_theta) * q1
+    return quats / np.linalg.norm(quats, axis=1, keepdims=True)
+
+
+def loc_rot_scale_matrices(loc, rot, scl):
+    # (n, 4, 4) matrices of unit w, x, y, z quaternions, as mathutils Matrix.LocRotScale
+    w, x, y, z = rot.T
+    matrices = np.zeros((len(loc), 4, 4))
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y - w * z)
+    matrices[:, 0, 2] = 2 * (x * z + w * y)
+    matrices[:, 1, 0] = 2 * (x * y + w * z)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z - w * x)
+    matrices[:, 2, 0] = 2 * (x * z - w * y)
+    matrices[:, 2, 1] = 2 * (y * z + w * x)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    matrices[:, :3, :3] *= scl[:, None, :]
+    matrices[:, :3, 3] = loc
+    matrices[:, 3, 3] = 1
+    return matrices
+
+
+def matrices_decompose(matrices):
+    # location, w, x, y, z rotation and scale of (n, 4, 4) matrices, as mathutils Matrix.decompose
+    loc = matrices[:, :3, 3]
+    rot = matrices[:, :3, :3]
+    scl = np.linalg.norm(rot, axis=1)
+    rot = rot / np.where(scl > 0, scl, 1)[:, None, :]
+    negative = np.linalg.det(rot) < 0
+    rot[negative] *= -1
+    scl[negative] *= -1
+
+    # largest of the trace and diagonal picks the stable formula for each matrix
+    m = rot
+    diagonal = np.stack((m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2], m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]), axis=1)
+    case = np.argmax(diagonal, axis=1)
+    s = 2 * np.sqrt(np.maximum(1 + 2 * diagonal[np.arange(len(m)), case] - diagonal[:, 0], 1e-12))
+    quats = np.where((case == 0)[:, None], np.stack((s / 4, (m[:, 2, 1] - m[:, 1, 2]) / s, (m[:, 0, 2] - m[:, 2, 0]) / s, (m[:, 1, 0] - m[:, 0, 1]) / s), axis=1), 0)
+    quats += np.where((case == 1)[:, None], np.stack(((m[:, 2, 1] - m[:, 1, 2]) / s, s / 4, (m[:, 0, 1] + m[:, 1, 0]) / s, (m[:, 0, 2] + m[:, 2, 0]) / s), axis=1), 0)
+    quats += np.where((case == 2)[:, None], np.stack(((m[:, 0, 2] - m[:, 2, 0]) / s, (m[:, 0, 1] + m[:, 1, 0]) / s, s / 4, (m[:, 1, 2] + m[:, 2, 1]) / s), axis=1), 0)
+    quats += np.where((case == 3)[:, None], np.stack(((m[:, 1, 0] - m[:, 0, 1]) / s, (m[:, 0, 2] + m[:, 2, 0]) / s, (m[:, 1, 2] + m[:, 2, 1]) / s, s / 4), axis=1), 0)
+    quats /= np.linalg.norm(quats, axis=1, keepdims=True)
+    quats[quats[:, 0] < 0] *= -1
+    return loc, quats, scl
+
+
+def quats_make_compatible(quats):
+    # flips each quaternion to the side of the previous one, as successive Quaternion.make_compatible calls
+    signs = np.cumprod(np.where(np.sum(quats[1:] * quats[:-1], axis=1) < 0, -1, 1))
+    quats[1:] *= signs[:, None]
+    return quats
+
+
 m3_key_type_collection_method = [
     m3_key_collect_evnt, m3_key_collect_vec2, m3_key_collect_vec3, m3_key_collect_quat, m3_key_collect_colo, m3_key_collect_real, m3_key_collect_real,
     m3_key_collect_real, m3_key_collect_real, m3_key_collect_real, m3_key_collect_real, m3_key_collect_real, m3_key_collect_bnds,
@@ -521,6 +754,11 @@ class Importer:
             else:
                 setattr(self.ob, version_attr, str(version_val))
 
+    def m3_array(self, ref):
+        # numpy view of the section a reference points to, empty for null references
+        section = self.m3[ref]
+        return section.array_view() if section else np.zeros(0)
+
     def m3_get_bone_name(self, bone_index):
         if bone_index < 0:
             return None
@@ -540,6 +778,8 @@ class Importer:
         action_name_set = set().union(id_data_loc.keys(), id_data_rot.keys(), id_data_scl.keys())
 
         default_loc, default_rot, default_scl = defaults
+        left_mat = np.array(left_mat)
+        right_mat = np.array(right_mat)
 
         for action_name in action_name_set:
             anim_data_loc = id_data_loc.get(action_name, None)
@@ -558,103 +798,43 @@ class Importer:
             if anim_data_scl_none:
                 anim_data_scl = [[0, default_scl.x], [0, default_scl.y], [0, default_scl.z]]
 
-            anim_frames = [anim_data_loc[0][::2], anim_data_rot[0][::2], anim_data_scl[0][::2]]
-            anim_frames_set = set().union(*anim_frames)
+            key_frames_loc, key_values_loc = m3_key_split(anim_data_loc)
+            key_frames_rot, key_values_rot = m3_key_split(anim_data_rot)
+            key_frames_scl, key_values_scl = m3_key_split(anim_data_scl)
+            frames = np.unique(np.concatenate((key_frames_loc, key_frames_rot, key_frames_scl)))
 
-            if not anim_frames_set:
+            if not len(frames):
                 return
 
-            # we put in original data first so that we can evaluate the fcurves.
-            # blender interpolates the data we need to apply the correction matrices for us.
-            # * can we interpolate based on interpolation of m3 anim header?
-            fcurves = bpy.data.actions.get(action_name).fcurves
-            # store fcurve references so that we don't have to find them later
-            fcurves_loc = []
-            for index, index_data in enumerate(anim_data_loc):
-                points_len = len(index_data) // 2
-                fcurve = fcurves.new(pose_bone.path_from_id('location'), index=index, action_group=pose_bone.name)
-                fcurve.select = False
-                fcurve.keyframe_points.add(points_len)
-                fcurve.keyframe_points.foreach_set('co', index_data)
-                fcurve.keyframe_points.foreach_set('interpolation', [1] * points_len)
-                fcurve.keyframe_points.foreach_set('select_control_point', key_sel := [False] * points_len)
-                fcurve.keyframe_points.foreach_set('select_left_handle', key_sel)
-                fcurve.keyframe_points.foreach_set('select_right_handle', key_sel)
-                fcurves_loc.append(fcurve)
-
-            fcurves_rot = []
-            for index, index_data in enumerate(anim_data_rot):
-                points_len = len(index_data) // 2
-                fcurve = fcurves.new(pose_bone.path_from_id('rotation_quaternion'), index=index, action_group=pose_bone.name)
-                fcurve.select = False
-                fcurve.keyframe_points.add(points_len)
-                fcurve.keyframe_points.foreach_set('co', index_data)
-                fcurve.keyframe_points.foreach_set('interpolation', [1] * points_len)
-                fcurve.keyframe_points.foreach_set('select_control_point', key_sel := [False] * points_len)
-                fcurve.keyframe_points.foreach_set('select_left_handle', key_sel)
-                fcurve.keyframe_points.foreach_set('select_right_handle', key_sel)
-                fcurves_rot.append(fcurve)
-
-            fcurves_scl = []
-            for index, index_data in enumerate(anim_data_scl):
-                points_len = len(index_data) // 2
-                fcurve = fcurves.new(pose_bone.path_from_id('scale'), index=index, action_group=pose_bone.name)
-                fcurve.select = False
-                fcurve.keyframe_points.add(points_len)
-                fcurve.keyframe_points.foreach_set('co', index_data)
-                fcurve.keyframe_points.foreach_set('interpolation', [1] * points_len)
-                fcurve.keyframe_points.foreach_set('select_control_point', key_sel := [False] * points_len)
-                fcurve.keyframe_points.foreach_set('select_left_handle', key_sel)
-                fcurve.keyframe_points.foreach_set('select_right_handle', key_sel)
-                fcurves_scl.append(fcurve)
-
-            new_anim_data = [[], [], []]
-            pre_rot = None
-            for frame in sorted(list(anim_frames_set)):
-                eval_loc = mathutils.Vector([fcurve.evaluate(frame) for fcurve in fcurves_loc])
-                eval_rot = mathutils.Quaternion([fcurve.evaluate(frame) for fcurve in fcurves_rot])
-                eval_scl = mathutils.Vector([fcurve.evaluate(frame) for fcurve in fcurves_scl])
-
-                loc, rot, scl = (left_mat @ mathutils.Matrix.LocRotScale(eval_loc, eval_rot, eval_scl) @ right_mat).decompose()
-
-                if pre_rot:
-                    rot.make_compatible(pre_rot)
-                pre_rot = rot
-
-                if frame in anim_frames[0]:
-                    new_anim_data[0].append(loc)
-
-                if frame in anim_frames[1]:
-                    new_anim_data[1].append(rot)
-
-                if frame in anim_frames[2]:
-                    new_anim_data[2].append(scl)
-
-            # second pass animation data, after evaluation
-            new_anim_data_loc = m3_key_collect_vec3(anim_frames[0], new_anim_data[0])
-            new_anim_data_rot = m3_key_collect_quat(anim_frames[1], new_anim_data[1])
-            new_anim_data_scl = m3_key_collect_vec3(anim_frames[2], new_anim_data[2])
-
-            for index, index_data in enumerate(new_anim_data_loc):
-                fcurve = fcurves_loc[index]
-                if anim_data_loc_none:
-                    fcurves.remove(fcurve)
-                else:
-                    fcurve.keyframe_points.foreach_set('co', index_data)
+            # the keys are interpolated at every key frame of the three channels, location and scale linearly and rotation
+            # spherically, then the correction matrices are applied to all frames at once
+            loc = keys_lerp(key_frames_loc, key_values_loc, frames)
+            rot = keys_slerp(key_frames_rot, key_values_rot, frames)
+            scl = keys_lerp(key_frames_scl, key_values_scl, frames)
+            loc, rot, scl = matrices_decompose(left_mat @ loc_rot_scale_matrices(loc, rot, scl) @ right_mat)
+            rot = quats_make_compatible(rot)
 
-            for index, index_data in enumerate(new_anim_data_rot):
-                fcurve = fcurves_rot[index]
-                if anim_data_rot_none:
-                    fcurves.remove(fcurve)
-                else:
-                    fcurve.keyframe_points.foreach_set('co', index_data)
+            fcurves = bpy.data.actions.get(action_name).fcurves
+            channels = (
+                ('location', anim_data_loc_none, key_frames_loc, loc),
+                ('rotation_quaternion', anim_data_rot_none, key_frames_rot, rot),
+                ('scale', anim_data_scl_none, key_frames_scl, scl),
+            )
+
+            for data_path, anim_data_none, key_frames, values in channels:
+                if anim_data_none:
+                    continue
 
-            for index, index_data in enumerate(new_anim_data_scl):
-                fcurve = fcurves_scl[index]
-                if anim_data_scl_none:
-                    fcurves.remove(fcurve)
-                else:
+                for index, index_data in enumerate(m3_key_interleave(key_frames, values[np.isin(frames, key_frames)])):
+                    points_len = len(index_data) // 2
+                    fcurve = fcurves.new(pose_bone.path_from_id(data_path), index=index, action_group=pose_bone.name)
+                    fcurve.select = False
+                    fcurve.keyframe_points.add(points_len)
                     fcurve.keyframe_points.foreach_set('co', index_data)
+                    fcurve.keyframe_points.foreach_set('interpolation', [1] * points_len)
+                    fcurve.keyframe_points.foreach_set('select_control_point', key_sel := [False] * points_len)
+                    fcurve.keyframe_points.foreach_set('select_left_handle', key_sel)
+                    fcurve.keyframe_points.foreach_set('select_right_handle', key_sel)
 
         # import bone batching flag
         id_data_render = self.stc_id_data.get(anim_ids[3], {})
@@ -711,33 +891,27 @@ class Importer:
                     m3_key_type_collection = m3_key_type_collection_list[anim_type]
                     m3_key_entries = self.m3[m3_key_type_collection][anim_index]
 
-                    frames = []
-                    ignored_indices = []
-                    for ii, ms in enumerate(self.m3[m3_key_entries.frames]):
-                        frame = to_bl_frame(ms)
-                        if frame not in frames:
-                            frames.append(frame)
-                        else:
-                            frames[-1] = frame
-                            ignored_indices.append(ii - 1)
-
-                    m3_keys = self.m3[m3_key_entries.keys]
-                    keys = [m3_keys[ii] for ii in range(len(m3_keys)) if ii not in ignored_indices]
-
-                    try:
-                        self.stc_id_data[stc_id][anim.action.name] = m3_key_type_collection_method[anim_type](frames, keys)
-                    except KeyError:
-                        self.stc_id_data[stc_id] = {}
-                        self.stc_id_data[stc_id][anim.action.name] = m3_key_type_collection_method[anim_type](frames, keys)
+                    frames, ignored_indices = m3_key_frames(self.m3_array(m3_key_entries.frames))
 
                     # consider making a dedicated property type and collection list for events
                     if m3_key_type_collection == m3_stc.sdev:
-                        for ii, frame in enumerate(frames):
-                            key = keys[ii]
+                        m3_keys = self.m3[m3_key_entries.keys]
+                        ignored_set = set(ignored_indices.tolist())
+                        keys = [m3_keys[ii] for ii in range(len(m3_keys)) if ii not in ignored_set]
+                        for frame, key in zip(frames.tolist(), keys):
                             event_name = self.m3[key.name].content_to_string()
                             if event_name == 'Evt_Simulate':
                                 anim_group['simulate'] = True
                                 anim_group['simulate_frame'] = frame
+                    else:
+                        m3_keys = self.m3_array(m3_key_entries.keys)
+                        keys = np.delete(m3_keys, ignored_indices[ignored_indices < len(m3_keys)])
+
+                    try:
+                        self.stc_id_data[stc_id][anim.action.name] = m3_key_type_collection_method[anim_type](frames, keys)
+                    except KeyError:
+                        self.stc_id_data[stc_id] = {}
+                        self.stc_id_data[stc_id][anim.action.name] = m3_key_type_collection_method[anim_type](frames, keys)
 
             anim_group['animations_index'] = len(anim_group.animations) - 1
 
@@ -1120,27 +1294,21 @@ class Importer:
             return
 
         self.m3_struct_version_set_from_ref('m3_mesh_version', self.m3_division.regions)
-        m3_vertices = self.m3[self.m3_model.vertices]
 
         v_colors = self.m3_model.bit_get('vertex_flags', 'color')
         v_class_desc = io_m3.M3StructureDescription.get_vertex_description(self.m3_model.vertex_flags)
-        v_count = len(m3_vertices) // v_class_desc.size
-        m3_vertices = v_class_desc.instances(buffer=m3_vertices.raw_bytes, count=v_count)
+        m3_vertices = self.m3[self.m3_model.vertices].array_view(v_class_desc)
         bone_lookup_full = self.m3[self.m3_model.bone_lookup]
 
-        if self.m3_model.bit_get('vertex_flags', 'skin0') and self.m3_model.bit_get('vertex_flags', 'skin1'):
-            get_lookup_weights = lambda x: (x.lookup0, x.lookup1, x.lookup2, x.lookup3, x.weight0, x.weight1, x.weight2, x.weight3)
-        elif self.m3_model.bit_get('vertex_flags', 'skin0') ^ self.m3_model.bit_get('vertex_flags', 'skin1'):
-            get_lookup_weights = lambda x: (x.lookup0, x.lookup1, x.weight0, x.weight1)
-        else:
-            get_lookup_weights = lambda x: ()
+        lookup_props = [prop for prop in v_class_desc.fields if prop.startswith('lookup')]
+        weight_props = [prop for prop in v_class_desc.fields if prop.startswith('weight')]
 
         uv_props = []
         for uv_prop in ['uv0', 'uv1', 'uv2', 'uv3', 'uv4']:
             if v_class_desc.fields.get(uv_prop):
                 uv_props.append(uv_prop)
 
-        m3_faces = self.m3[self.m3_division.faces]
+        m3_faces = self.m3[self.m3_division.faces].array_view()
         m3_batches = self.m3[self.m3_division.batches]
         self.m3_bl_ref[self.m3_division.regions.index] = {}
 
@@ -1151,27 +1319,28 @@ class Importer:
                 continue
 
             regn_m3_verts = m3_vertices[region.first_vertex_index:region.first_vertex_index + region.vertex_count]
-            regn_m3_faces = m3_faces[region.first_face_index:region.first_face_index + region.face_count]
+            regn_m3_faces = m3_faces[region.first_face_index:region.first_face_index + region.face_count].astype(np.int64)
             regn_uv_multiply = getattr(region, 'uv_multiply', 16)
             regn_uv_offset = getattr(region, 'uv_offset', 0)
 
             if region.desc.version <= 2:
-                for ii in range(len(regn_m3_faces)):
-                    regn_m3_faces[ii] -= region.first_vertex_index
-
-            regn_m3_vert_ids = {}
-            regn_m3_vert_to_id = {}
-            regn_m3_verts_new = []
-
-            dups = 0
-            for ii, v in enumerate(regn_m3_verts):
-                id_tuple = (*to_bl_vec3(v.pos), *to_bl_vec3(v.normal), *get_lookup_weights(v))
-                regn_m3_vert_to_id[ii] = id_tuple
-                if regn_m3_vert_ids.get(id_tuple) is None:
-                    regn_m3_vert_ids[id_tuple] = ii - dups
-                    regn_m3_verts_new.append(v)
-                else:
-                    dups += 1
+                regn_m3_faces -= region.first_vertex_index
+
+            # vertices differing only in loop data (uvs and colors) become a single vertex
+            regn_m3_vert_ids, regn_m3_vert_to_id = m3_vertex_dedup(regn_m3_verts, ['pos', 'normal', *lookup_props, *weight_props])
+            regn_m3_verts_new = regn_m3_verts[regn_m3_vert_ids]
+            regn_m3_lookup_weights = m3_vertex_columns(regn_m3_verts_new, lookup_props + weight_props).tolist() if lookup_props else [()] * len(regn_m3_verts_new)
+
+            regn_m3_tris = regn_m3_faces[:len(regn_m3_faces) // 3 * 3].reshape(-1, 3)
+            regn_m3_tris = regn_m3_tris[tris_new_mask(regn_m3_vert_to_id[regn_m3_tris])]  # drops duplicate or degenerate faces
+            tris = regn_m3_vert_to_id[regn_m3_tris]
+            edges, loop_edges = tris_edges(tris, len(regn_m3_verts_new))
+
+            # rejoins vertices split by the exporter along uv seams and sharp edges
+            weld_map, edge_sharp = seam_weld_map(regn_m3_verts_new['pos'], edges, loop_edges, regn_m3_lookup_weights)
+            verts_kept, tris, edges, edge_sharp, loop_edges, loops_kept = weld_apply(weld_map, tris, edges, loop_edges, edge_sharp)
+            regn_m3_verts_new = regn_m3_verts_new[verts_kept]
+            loop_m3_verts = regn_m3_verts[regn_m3_tris.ravel()[loops_kept]]
 
             mesh = bpy.data.meshes.new('Mesh')
             mesh_ob = bpy.data.objects.new('Mesh', mesh)
@@ -1189,7 +1358,7 @@ class Importer:
             for lookup in bone_lookup:
                 mesh_ob.vertex_groups.new(name=self.m3_get_bone_name(lookup))
 
-            vertex_groups_used = [False for g in mesh_ob.vertex_groups]
+            vertex_groups_used = np.zeros(len(mesh_ob.vertex_groups), dtype=bool)
 
             for batch in region_batches:
                 mesh_batch = shared.m3_item_add(mesh_ob.m3_mesh_batches)
@@ -1205,130 +1374,51 @@ class Importer:
                     pose_bone = ob.pose.bones.get(pose_bone_name)
                     mesh_batch.bone.handle = pose_bone.bl_handle if pose_bone else ''
 
-            bm = bmesh.new(use_operators=True)
-
-            layer_deform = bm.verts.layers.deform.new('m3lookup')
-            layer_color = bm.loops.layers.color.new('m3color') if v_colors else None
-            layer_alpha = bm.loops.layers.color.new('m3alpha') if v_colors else None
+            # arrays match the item types of the mesh properties, so foreach_set copies them in one go
+            mesh.vertices.add(len(regn_m3_verts_new))
+            mesh.vertices.foreach_set('co', regn_m3_verts_new['pos'].ravel())
+            mesh.edges.add(len(edges))
+            mesh.edges.foreach_set('vertices', edges.ravel().astype(np.int32))
+            mesh.edges.foreach_set('use_edge_sharp', edge_sharp)
+            mesh.loops.add(len(tris) * 3)
+            mesh.loops.foreach_set('vertex_index', tris.ravel().astype(np.int32))
+            mesh.loops.foreach_set('edge_index', loop_edges.astype(np.int32))
+            mesh.polygons.add(len(tris))
+            mesh.polygons.foreach_set('loop_start', np.arange(0, len(tris) * 3, 3, dtype=np.int32))
+            mesh.polygons.foreach_set('loop_total', np.full(len(tris), 3, dtype=np.int32))
+            mesh.polygons.foreach_set('use_smooth', np.ones(len(tris), dtype=bool))
 
             for uv_prop in uv_props:
-                bm.loops.layers.uv.new(uv_prop)
-
-            vert_to_m3_vert = {}
-            for m3_vert in regn_m3_verts_new:
-                vert = bm.verts.new((m3_vert.pos.x, m3_vert.pos.y, m3_vert.pos.z))
-
-                vert_to_m3_vert[vert] = m3_vert
-
-                for ii in range(0, region.vertex_lookups_used):
-                    weight = getattr(m3_vert, 'weight' + str(ii), 255)
-                    if weight:
-                        lookup_index = getattr(m3_vert, 'lookup' + str(ii), region.first_bone_lookup_index)
-                        vertex_groups_used[lookup_index] = True
-                        vert[layer_deform][lookup_index] = weight / 255
-
-            bm.verts.ensure_lookup_table()
-
-            for ii in range(0, len(regn_m3_faces), 3):
-
-                try:
-                    v0 = bm.verts[regn_m3_vert_ids.get(regn_m3_vert_to_id[regn_m3_faces[ii]])]
-                    v1 = bm.verts[regn_m3_vert_ids.get(regn_m3_vert_to_id[regn_m3_faces[ii + 1]])]
-                    v2 = bm.verts[regn_m3_vert_ids.get(regn_m3_vert_to_id[regn_m3_faces[ii + 2]])]
-                    face = bm.faces.new((v0, v1, v2))
-                    face.smooth = True
-
-                    for jj in range(3):
-                        m3v = regn_m3_verts[regn_m3_faces[ii + jj]]
-                        loop = face.loops[jj]
-                        for uv_prop in uv_props:
-                            layer_uv = bm.loops.layers.uv.get(uv_prop)
-                            loop[layer_uv].uv = to_bl_uv(getattr(m3v, uv_prop), regn_uv_multiply, regn_uv_offset)
-                        if layer_color:
-                            loop[layer_color] = (m3v.col.r / 255, m3v.col.g / 255, m3v.col.b / 255, 1)
-                            loop[layer_alpha] = (m3v.col.a / 255, m3v.col.a / 255, m3v.col.a / 255, 1)
-                except ValueError:
-                    pass  # most likely to be duplicate or degenerate face
-
-            bm.faces.ensure_lookup_table()
-
-            def get_matching_edge(origin, target):
-                for oedge in origin.link_edges:
-                    for tedge in target.link_edges:
-                        if len(set((tuple(oedge.verts[0].co), tuple(oedge.verts[1].co), tuple(tedge.verts[0].co), tuple(tedge.verts[1].co)))) == 2:
-                            return not tedge.smooth  # return False if the edge is smooth
-                return False
-
-            doubles = bmesh.ops.find_doubles(bm, verts=bm.verts, dist=0.00001)['targetmap']
-            for origin in list(doubles.keys()):
-                target = doubles[origin]
-
-                for edge in [*origin.link_edges, *target.link_edges]:
-                    if len(edge.link_faces) == 1:
-                        edge.smooth = False
-
-            doubles_inverse = {}
-            for key in doubles:
-                try:
-                    doubles_inverse[doubles[key]].append(key)
-                except KeyError:
-                    doubles_inverse[doubles[key]] = [key]
-
-            point_lists = []
-            for key in doubles:
-                key_assigned = False
-                for plist in point_lists:
-                    if doubles[key] in plist:
-                        plist.append(key)
-                        key_assigned = True
-                        break
-                    elif doubles_inverse.get(key):
-                        for val in doubles_inverse[key]:
-                            if val in plist:
-                                plist.append(key)
-                                key_assigned = True
-                                break
-                if not key_assigned:
-                    point_lists.append([key, doubles[key]])
-
-            edge_match_dict = {}
-            for plist in point_lists:
-                for ii, origin in enumerate(plist):
-                    plist.pop(ii)
-                    edge_match_dict[origin] = {target: get_matching_edge(origin, target) for target in plist}
-                    plist.insert(ii, origin)
-
-            for origin in edge_match_dict:
-                for target in edge_match_dict[origin]:
-                    if not edge_match_dict[origin][target]:
-                        if doubles.get(origin) == target and doubles.get(target) != origin:
-                            common_keys = list(set(edge_match_dict[origin].keys()).intersection(edge_match_dict[target].keys()))
-                            common_dict = {key: edge_match_dict[target][key] for key in common_keys}
-                            if True not in common_dict.values():
-                                doubles.pop(origin, None)
-                        elif doubles.get(target) == origin and doubles.get(origin) != target:
-                            common_keys = list(set(edge_match_dict[origin].keys()).intersection(edge_match_dict[target].keys()))
-                            common_dict = {key: edge_match_dict[target][key] for key in common_keys}
-                            if True not in common_dict.values():
-                                doubles.pop(target, None)
-
-            for origin in list(doubles.keys()):
-                target = doubles[origin]
-
-                m3v0 = vert_to_m3_vert[origin]
-                m3v1 = vert_to_m3_vert[target]
-
-                m3v0_lookup_id = get_lookup_weights(m3v0)
-                m3v1_lookup_id = get_lookup_weights(m3v1)
-
-                if m3v0_lookup_id != m3v1_lookup_id:
-                    try:
-                        del doubles[origin]
-                    except KeyError:
-                        pass  # origin is somehow deleted sometimes?
-            bmesh.ops.weld_verts(bm, targetmap=doubles)
-
-            bm.to_mesh(mesh)
+                uvs = to_bl_uvs(loop_m3_verts[uv_prop], regn_uv_multiply, regn_uv_offset)
+                mesh.uv_layers.new(name=uv_prop).data.foreach_set('uv', uvs)
+
+            if v_colors:
+                # the color bytes are stored in b, g, r, a order, byte color attributes store them as given while
+                # their color property is linear
+                m3_colors = srgb_to_linear(loop_m3_verts['col'].astype(np.float64) / 255)
+                colors = np.ones((len(m3_colors), 4), dtype=np.float32)
+                colors[:, :3] = m3_colors[:, 2::-1]
+                mesh.color_attributes.new('m3color', 'BYTE_COLOR', 'CORNER').data.foreach_set('color', colors.ravel())
+                colors[:, :3] = m3_colors[:, 3:]
+                mesh.color_attributes.new('m3alpha', 'BYTE_COLOR', 'CORNER').data.foreach_set('color', colors.ravel())
+
+            # vertex group weights are added in batches of vertices sharing a lookup and weight,
+            # later lookup slots replace the weight of earlier ones for the same group
+            for ii in range(0, region.vertex_lookups_used):
+                weight_prop = 'weight' + str(ii)
+                lookup_prop = 'lookup' + str(ii)
+                weights = regn_m3_verts_new[weight_prop] if weight_prop in weight_props else np.full(len(regn_m3_verts_new), 255)
+                lookups = regn_m3_verts_new[lookup_prop] if lookup_prop in lookup_props else np.full(len(regn_m3_verts_new), region.first_bone_lookup_index)
+                weighted = np.flatnonzero(weights)
+                vertex_groups_used[lookups[weighted]] = True
+
+                group_keys = lookups[weighted].astype(np.int64) * 256 + weights[weighted]
+                order = np.argsort(group_keys, kind='stable')
+                group_keys, group_starts = np.unique(group_keys[order], return_index=True)
+                for group_key, group_indices in zip(group_keys.tolist(), np.split(weighted[order], group_starts[1:])):
+                    mesh_ob.vertex_groups[group_key // 256].add(group_indices.tolist(), (group_key % 256) / 255, 'REPLACE')
+
+            mesh.update()
 
             # Calculate tangents for glTF/GLB export compatibility
             if mesh.uv_layers:
@@ -1,39 +1,87 @@
 import re
 import struct
+from collections import namedtuple
+from . import io_m3
+
+# Pattern:
+# (?:[a-zA-Z0-9_\\/.-]+) -> Match path characters
+# \.(?:dds|tga) -> Match extension
+texture_path_pattern = re.compile(rb'(?:[a-zA-Z0-9_\\/.-]+)\.(?:dds|tga)', re.IGNORECASE)
+
+# material_type is the MODL field without its 'materials_' prefix, role the LAYR field without 'layer_',
+# or 'texture_path' for paths listed by buffer (MADD) materials
+M3TextureReference = namedtuple('M3TextureReference', ['path', 'material_type', 'material_name', 'role'])
+
 
 class M3Analyzer:
     def __init__(self):
         pass
 
+    def get_texture_references(self, m3_data):
+        """
+        Returns the texture references of an M3 model as M3TextureReference tuples.
+        Only the section index, the model header, the material sections and the layer and
+        path sections they reference are decoded, in place of scanning the whole file.
+        """
+        references = []
+        with io_m3.M3SectionList.load(m3_data, lazy=True) as m3:
+            self.collect_texture_references(m3, references)
+        return references
+
+    def collect_texture_references(self, m3, references):
+        model = m3.model
+        for field in model.desc.fields.values():
+            if not field.name.startswith('materials_'):
+                continue
+
+            material_type = field.name.removeprefix('materials_')
+            for material in m3[getattr(model, field.name)]:
+                material_name = m3[material.name].content_to_string()
+
+                for material_field in material.desc.fields.values():
+                    if getattr(material_field, 'ref_to', None) != 'LAYR':
+                        continue
+                    for layer in m3[getattr(material, material_field.name)]:
+                        if layer.color_bitmap.index:
+                            path = m3[layer.color_bitmap].content_to_string()
+                            if path:
+                                references.append(M3TextureReference(path, material_type, material_name, material_field.name.removeprefix('layer_')))
+
+                if material.desc.history.name == 'MADD':
+                    for schr in m3[material.texture_paths]:
+                        path = m3[schr.path].content_to_string()
+                        if path:
+                            references.append(M3TextureReference(path, material_type, material_name, 'texture_path'))
+
     def get_dependencies(self, m3_data):
         """
         Parses binary M3 data and returns a list of referenced texture paths.
-        This is a heuristic parser that looks for strings ending in .dds or .tga.
+        Falls back to a heuristic scan for strings ending in .dds or .tga if the
+        data cannot be read as an M3 model.
         """
         if not m3_data:
             return []
 
         dependencies = set()
-        
+
         try:
-            # Decode binary to string with errors='ignore' to use regex on text
-            # This is safer than binary regex for simple path finding
-            text_data = m3_data.decode('utf-8', errors='ignore')
-            
-            # Pattern: 
-            # (?:[a-zA-Z0-9_\\/.-]+) -> Match path characters
-            # \.(?:dds|tga) -> Match extension
-            pattern = re.compile(r'(?:[a-zA-Z0-9_\\/.-]+)\.(?:dds|tga)', re.IGNORECASE)
-            
-            matches = pattern.findall(text_data)
-            
-            for match in matches:
+            for reference in self.get_texture_references(m3_data):
+                # Normalize path separators
+                dependencies.add(reference.path.replace('/', '\\'))
+            return list(dependencies)
+        except Exception as e:
+            print(f"Error reading M3 structure, scanning for texture paths instead: {e}")
+
+        try:
+            # Match on the raw bytes, which also works on memoryviews from CascWrapper.read_file_view
+            # without decoding a string copy of the whole model
+            for match in texture_path_pattern.findall(m3_data):
                 # Filter out likely garbage
                 if len(match) > 4 and len(match) < 260:
                     # Normalize path separators
-                    clean_path = match.replace('/', '\\')
+                    clean_path = match.decode('ascii').replace('/', '\\')
                     dependencies.add(clean_path)
-                    
+
         except Exception as e:
             print(f"Error analyzing M3 data: {e}")
 
@@ -25,6 +25,13 @@ e_section_reuse_mode = (
     ('FACTORED', 'Factored', 'Sections will be reused in all possible cases, where sections exactly match other existing sections. Reduces file size')
 )
 
+e_validation_level = (
+    ('OFF', 'Off', 'Skips validation of the exported data. Empty sections are still removed'),
+    ('STRUCTURAL', 'Structural', 'Only checks section contents and reference ranges, without checking individual fields'),
+    ('SAMPLED', 'Sampled', 'Structural checks, plus field checks of a random subset of each section and mesh region'),
+    ('FULL', 'Full', 'Checks every field of all exported data, including every vertex. Slowest for large models'),
+)
+
 e_face_storage_mode = (
     ('STANDARD', 'Standard', 'Uses the Blizzard standard method for defining how mesh faces are stored and drawn'),
     ('COMPACT', 'Compact (Experimental)', 'Uses a different method of storing and iterating over mesh faces that allows reuse of indices. Reduces file size compared to Standard when there are meshes with 2 or more material assignments.\n\nWARNING: The resulting model is known to cause graphical glitches and/or instability while in the Cutscene Editor, but has not been observed to cause similar problems in-game'),
@@ -39,6 +46,7 @@ e_vert_format_lookup = (
 class ExportOptionsGroup(bpy.types.PropertyGroup):
     output_anims: bpy.props.BoolProperty(default=True, name='Output Animations', description='Include animations in the resulting m3 file. (Unchecked does not apply when exporting as m3a)')
     section_reuse_mode: bpy.props.EnumProperty(default='EXPLICIT', name='Section Reuse', items=e_section_reuse_mode)
+    validation_level: bpy.props.EnumProperty(default='FULL', name='Validation', items=e_validation_level)
     # ! disabling these next two options since I can't reliably make the output models stable
     # face_storage_mode: bpy.props.EnumProperty(default='STANDARD', name='Face Output Mode', items=e_face_storage_mode)
     # vert_format_lookup: bpy.props.EnumProperty(default='STANDARD', name='Lookups', items=e_vert_format_lookup)
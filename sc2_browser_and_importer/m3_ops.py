@@ -61,6 +61,7 @@ class M3ExportOperator(bpy.types.Operator):
 
     output_anims: bpy.props.BoolProperty(default=True, name='Output Animations', description='Include animations in the resulting m3 file. (Unchecked does not apply when exporting as m3a)')
     section_reuse_mode: bpy.props.EnumProperty(default='EXPLICIT', name='Section Reuse', items=m3_object_armature.e_section_reuse_mode)
+    validation_level: bpy.props.EnumProperty(default='FULL', name='Validation', items=m3_object_armature.e_validation_level)
     cull_unused_bones: bpy.props.BoolProperty(default=True, name='Cull Unused Bones', description='Bones which the exporter determines will not be referenced in the m3 file are removed')
     cull_material_layers: bpy.props.BoolProperty(default=True, name='Cull Material Layers', description='Fills all blank material layer slots with a reference to a single layer section, which reduces file size.')
     use_only_max_bounds: bpy.props.BoolProperty(default=False, name='Use Only Max Bounds', description='Animations will have exactly one bounding box key with maximum dimensions.')
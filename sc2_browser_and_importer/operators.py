@@ -1,9 +1,10 @@
 import bpy
 import os
 import shutil
-import tempfile
 import aud
-from .casc_wrapper import CascWrapper
+from .casc_session import get_session
+from .casc_index import get_listing_index, get_texture_resolver
+from .casc_search import SEARCH_RESULT_LIMIT, get_search_index
 
 # Global sound handle to keep track of playback
 _sound_handle = None
@@ -27,8 +28,8 @@ class SC2_OT_SearchAssetsV2(bpy.types.Operator):
         
         # Initialize CASC
         try:
-            casc = CascWrapper()
-            if not casc.open_storage():
+            casc = get_session().acquire('search')
+            if not casc.is_open:
                 # Try to get error info
                 err_msg = f"Failed to open SC2 storage at '{casc.storage_path}'."
                 if casc.casc:
@@ -42,7 +43,13 @@ class SC2_OT_SearchAssetsV2(bpy.types.Operator):
             
             # Search
             self.report({'INFO'}, f"Searching for: {query}")
-            results = casc.search_files(query)
+            if '*' in query or '?' in query:
+                # CascLib style mask
+                results = get_listing_index(casc).search(query, limit=SEARCH_RESULT_LIMIT)
+            else:
+                # substring terms, falling back to fuzzy matching for typos
+                search_index = get_search_index(casc)
+                results = search_index.search(query, limit=SEARCH_RESULT_LIMIT) or search_index.fuzzy(query)
             
             # Populate results
             for file_path in results:
@@ -51,9 +58,12 @@ class SC2_OT_SearchAssetsV2(bpy.types.Operator):
                 item.path = file_path
                 item.file_type = self._get_file_type(file_path)
             
-            casc.close_storage()
+            get_session().release()
             
-            self.report({'INFO'}, f"Found {len(results)} files")
+            if len(results) >= SEARCH_RESULT_LIMIT:
+                self.report({'INFO'}, f"Showing the first {len(results)} files, refine the query to see more")
+            else:
+                self.report({'INFO'}, f"Found {len(results)} files")
             
         except Exception as e:
             self.report({'ERROR'}, f"Search failed: {str(e)}")
@@ -101,30 +111,31 @@ class SC2_OT_ImportAssetV2(bpy.types.Operator):
             self.report({'WARNING'}, "Only .m3 or .m3a files can be imported")
             return {'CANCELLED'}
         
-        # Create temp directory for extraction
-        temp_dir = tempfile.mkdtemp(prefix="sc2_import_")
         model_filename = os.path.basename(casc_path)
-        model_dest = os.path.join(temp_dir, model_filename)
         
         try:
             # Initialize CASC
-            casc = CascWrapper()
-            if not casc.open_storage():
+            casc = get_session().acquire('import')
+            if not casc.is_open:
                 self.report({'ERROR'}, "Failed to open SC2 storage")
                 return {'CANCELLED'}
             
+            # Models are extracted into the session temp dir mirroring their CASC path, in place of a new temp dir per
+            # import, imported images keep pointing at the textures extracted next to the model until Blender exits
+            model_dest = casc.casc_path_to_dest(casc_path, os.path.join(casc.get_temp_dir(), "imports"))
+            
             # Extract model
             self.report({'INFO'}, f"Extracting {model_filename}...")
             if not casc.extract_file(casc_path, model_dest):
                 self.report({'ERROR'}, f"Failed to extract {model_filename}")
-                casc.close_storage()
+                get_session().release()
                 return {'CANCELLED'}
             
             # Smart extract textures
             if scene.sc2_smart_extract:
-                self._extract_textures(casc, casc_path, temp_dir, model_dest)
+                self._extract_textures(casc, casc_path, model_dest)
             
-            casc.close_storage()
+            get_session().release()
             
             if is_m3:
                 # Import using integrated m3 importer
@@ -163,68 +174,49 @@ class SC2_OT_ImportAssetV2(bpy.types.Operator):
         
         return {'FINISHED'}
     
-    def _extract_textures(self, casc, model_casc_path, temp_dir, model_dest_path):
+    def _extract_textures(self, casc, model_casc_path, model_dest_path):
         """Extract textures referenced by the model"""
         try:
-            # Read model data
-            m3_data = casc.read_file_content(model_casc_path)
-            if not m3_data:
+            # Read model data into a pooled buffer
+            m3_file = casc.read_file_view(model_casc_path)
+            if not m3_file:
                 return
             
             # Analyze for dependencies
             analyzer = M3Analyzer()
-            dependencies = analyzer.get_dependencies(m3_data)
+            with m3_file as m3_data:
+                dependencies = analyzer.get_dependencies(m3_data)
             
             if not dependencies:
                 return
             
             self.report({'INFO'}, f"Found {len(dependencies)} texture dependencies")
             
-            # Extract each texture
+            # Map each reference to its real CASC path through the listing index
+            preferences = bpy.context.preferences.addons[__package__].preferences
+            roots = [root for root in preferences.texture_root_priority.split(';') if root.strip()]
+            resolver = get_texture_resolver(casc, roots)
+            
+            tex_paths = []
+            casc_paths = []
             for tex_path in dependencies:
-                # Generate candidate paths
-                candidates = self._generate_texture_candidates(tex_path)
-                
-                # Try to extract
-                for candidate in candidates:
-                    # Normalize path for local OS
-                    norm_tex_path = tex_path.replace('\\', os.sep).replace('/', os.sep)
-                    full_tex_dest = os.path.join(os.path.dirname(model_dest_path), norm_tex_path)
-                    
-                    if casc.extract_file(candidate, full_tex_dest):
-                        self.report({'INFO'}, f"  + Extracted texture: {tex_path}")
-                        break
+                resolved_path = resolver.resolve(tex_path)
+                if resolved_path:
+                    tex_paths.append(tex_path)
+                    casc_paths.append(resolved_path)
+                else:
+                    self.report({'INFO'}, f"  - Texture not found in storage: {tex_path}")
+            
+            # Normalize path for local OS
+            dest_paths = [tex_path.replace('\\', os.sep).replace('/', os.sep) for tex_path in tex_paths]
+            results = casc.extract_many(casc_paths, os.path.dirname(model_dest_path), dest_paths=dest_paths)
+            
+            for tex_path, result in zip(tex_paths, results):
+                if result.success:
+                    self.report({'INFO'}, f"  + Extracted texture: {tex_path}")
                         
         except Exception as e:
             self.report({'WARNING'}, f"Texture extraction failed: {str(e)}")
-    
-    def _generate_texture_candidates(self, tex_path):
-        """Generate possible CASC paths for a texture"""
-        candidates = []
-        
-        # Common CASC roots
-        roots = [
-            "", # As is
-            "mods\\liberty.sc2mod\\base.sc2assets\\",
-            "Campaigns\\Liberty.SC2Campaign\\Base.SC2Assets\\",
-            "mods\\swarm.sc2mod\\base.sc2assets\\",
-            "mods\\void.sc2mod\\base.sc2assets\\"
-        ]
-        
-        # Normalize path separators in tex_path to backslash for CASC
-        tex_path = tex_path.replace('/', '\\')
-        
-        # If path already has Assets/Textures, don't prepend it again
-        if "assets\\textures" in tex_path.lower():
-            for root in roots:
-                candidates.append(f"{root}{tex_path}")
-        else:
-            # Try with and without Assets/Textures prefix
-            for root in roots:
-                candidates.append(f"{root}{tex_path}")
-                candidates.append(f"{root}Assets\\Textures\\{tex_path}")
-        
-        return candidates
 
 
 def simplify_materials_for_gltf(objects):
@@ -848,18 +840,16 @@ class SC2_OT_LoadTextureThumbnails(bpy.types.Operator):
         # Limit to avoid long load times
         texture_items = texture_items[:self.max_textures]
         
-        # Create temp directory for extraction
-        temp_dir = tempfile.mkdtemp(prefix="sc2_thumbnails_")
-        
         try:
-            casc = CascWrapper()
-            if not casc.open_storage():
+            casc = get_session().acquire('thumbnails')
+            if not casc.is_open:
                 self.report({'ERROR'}, "Failed to open SC2 storage")
                 return {'CANCELLED'}
             
             loaded = 0
             cache = get_texture_cache()
             
+            casc_paths = []
             for idx, item in texture_items:
                 casc_path = item.path
                 ext = os.path.splitext(casc_path)[1].lower()
@@ -871,11 +861,14 @@ class SC2_OT_LoadTextureThumbnails(bpy.types.Operator):
                 if casc_path in cache:
                     continue
                 
+                casc_paths.append(casc_path)
+            
+            # Extract (or find in the extraction cache) in parallel, images are loaded afterwards on the main thread
+            for casc_path, tex_dest in zip(casc_paths, casc.map_parallel(casc.local_file, casc_paths)):
                 # CASC paths use backslashes - normalize and get just the filename
                 tex_filename = os.path.basename(casc_path.replace('\\', '/'))
-                tex_dest = os.path.join(temp_dir, f"{idx}_{tex_filename}")
                 
-                if casc.extract_file(casc_path, tex_dest):
+                if tex_dest:
                     try:
                         # Load into Blender
                         img = bpy.data.images.load(tex_dest, check_existing=False)
@@ -890,7 +883,7 @@ class SC2_OT_LoadTextureThumbnails(bpy.types.Operator):
                     except Exception as e:
                         print(f"Failed to load {tex_filename}: {e}")
             
-            casc.close_storage()
+            get_session().release()
             
             self.report({'INFO'}, f"Loaded {loaded} thumbnail(s)")
             
@@ -942,23 +935,22 @@ class SC2_OT_LoadTexturePreview(bpy.types.Operator):
                 return {'FINISHED'}
         
         # Extract and load texture
-        temp_dir = tempfile.mkdtemp(prefix="sc2_texture_preview_")
         # CASC paths use backslashes - normalize and get just the filename
         tex_filename = os.path.basename(casc_path.replace('\\', '/'))
-        tex_dest = os.path.join(temp_dir, tex_filename)
         
         try:
-            casc = CascWrapper()
-            if not casc.open_storage():
+            casc = get_session().acquire('texture_preview')
+            if not casc.is_open:
                 self.report({'ERROR'}, "Failed to open SC2 storage")
                 return {'CANCELLED'}
             
-            if not casc.extract_file(casc_path, tex_dest):
+            tex_dest = casc.local_file(casc_path)
+            if not tex_dest:
                 self.report({'ERROR'}, f"Failed to extract {tex_filename}")
-                casc.close_storage()
+                get_session().release()
                 return {'CANCELLED'}
             
-            casc.close_storage()
+            get_session().release()
             
             # Load into Blender
             img = bpy.data.images.load(tex_dest, check_existing=True)
@@ -1009,22 +1001,21 @@ class SC2_OT_LoadSoundPreview(bpy.types.Operator):
              return {'CANCELLED'}
 
         # Extract sound
-        temp_dir = tempfile.mkdtemp(prefix="sc2_sound_preview_")
         sound_filename = os.path.basename(casc_path.replace('\\', '/'))
-        sound_dest = os.path.join(temp_dir, sound_filename)
 
         try:
-            casc = CascWrapper()
-            if not casc.open_storage():
+            casc = get_session().acquire('sound_preview')
+            if not casc.is_open:
                 self.report({'ERROR'}, "Failed to open SC2 storage")
                 return {'CANCELLED'}
 
-            if not casc.extract_file(casc_path, sound_dest):
+            sound_dest = casc.local_file(casc_path)
+            if not sound_dest:
                 self.report({'ERROR'}, f"Failed to extract {sound_filename}")
-                casc.close_storage()
+                get_session().release()
                 return {'CANCELLED'}
 
-            casc.close_storage()
+            get_session().release()
 
             # Update Scene properties
             scene.sc2_preview_sound = sound_filename
@@ -1,5 +1,12 @@
 import bpy
 import os
+from .casc_index import DEFAULT_TEXTURE_ROOTS
+
+
+def update_idle_timeout(self, context):
+    from .casc_session import schedule_idle_check
+    schedule_idle_check()
+
 
 class SC2AssetBrowserPreferencesV2(bpy.types.AddonPreferences):
     bl_idname = __package__
@@ -11,9 +18,56 @@ class SC2AssetBrowserPreferencesV2(bpy.types.AddonPreferences):
         description="Path to the StarCraft II installation directory"
     )
 
+    casc_idle_timeout: bpy.props.IntProperty(
+        name="Storage Idle Timeout",
+        default=300,
+        min=0,
+        description="Seconds of inactivity before the shared CASC storage is closed (0 keeps it open)",
+        update=update_idle_timeout
+    )
+
+    use_extraction_cache: bpy.props.BoolProperty(
+        name="Cache Extracted Files",
+        default=True,
+        description="Keep extracted models, textures and sounds on disk so repeated imports skip the CASC storage"
+    )
+
+    extraction_cache_size: bpy.props.IntProperty(
+        name="Cache Size (MB)",
+        default=2048,
+        min=16,
+        description="Disk budget of the extraction cache, least recently used files are removed first"
+    )
+
+    texture_root_priority: bpy.props.StringProperty(
+        name="Texture Root Priority",
+        default=';'.join(DEFAULT_TEXTURE_ROOTS),
+        description="Semicolon separated CASC roots searched for model textures, earlier roots win when a texture exists in several"
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.prop(self, "sc2_install_path")
+        layout.prop(self, "casc_idle_timeout")
+        layout.prop(self, "use_extraction_cache")
+        row = layout.row()
+        row.enabled = self.use_extraction_cache
+        row.prop(self, "extraction_cache_size")
+        layout.prop(self, "texture_root_priority")
+
+        from .casc_cache import peek_extraction_cache
+        from .casc_session import get_session
+        session = get_session()
+        box = layout.box()
+        box.label(text="Storage Session: " + ("Open" if session.is_open() else "Closed"))
+        for caller, stats in sorted(session.stats.items()):
+            box.label(text=f"{caller}: {stats['hits']} hits, {stats['misses']} misses")
+
+        cache = peek_extraction_cache()
+        if cache is not None:
+            box = layout.box()
+            box.label(text=f"Extraction Cache: {cache.total_bytes / (1024 * 1024):.1f} MB used")
+            box.label(text=f"{cache.hits} hits, {cache.misses} misses ({cache.hit_rate() * 100:.0f}% hit rate)")
 
 def register():
     pass